@@ -2,21 +2,26 @@
 Módulo principal do dashboard
 """
 
-import streamlit as st
 from pathlib import Path
-import logging
 import sys
 import os
+
+# Adiciona o diretório raiz ao PYTHONPATH
+root_dir = str(Path(__file__).parent.parent)
+sys.path.insert(0, root_dir)
+
+# Limites de threads antes de qualquer import de numpy/pandas/FAISS/PyTorch
+from app.config.threads_config import setup_threads
+setup_threads()
+
+import streamlit as st
+import logging
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import json
 
-# Adiciona o diretório raiz ao PYTHONPATH
-root_dir = str(Path(__file__).parent.parent)
-sys.path.insert(0, root_dir)
-
 from app.utils.data_loader import DataLoader
 from app.utils.formatters import format_currency, format_percentage
 from app.utils.visualizations import Visualizer
@@ -0,0 +1,47 @@
+"""
+Configuração dos pools de threads da aplicação
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Threads por pool: Streamlit, FAISS, MKL e PyTorch rodam no mesmo processo e,
+# cada um com um thread por núcleo, disputariam a CPU entre si
+DEFAULT_NUM_THREADS = min(4, os.cpu_count() or 1)
+
+def setup_threads():
+    """
+    Define os limites de threads do OpenMP/MKL antes de carregar FAISS e PyTorch
+    
+    Usa setdefault para respeitar valores já definidos no ambiente (por exemplo
+    pelo ipexrun). OMP_WAIT_POLICY=PASSIVE faz as threads ociosas dormirem em
+    vez de girar, liberando núcleos para as threads do Streamlit.
+    """
+    num_threads = str(DEFAULT_NUM_THREADS)
+    os.environ.setdefault("OMP_NUM_THREADS", num_threads)
+    os.environ.setdefault("MKL_NUM_THREADS", num_threads)
+    os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
+
+def configure_threads():
+    """
+    Aplica os limites de threads ao PyTorch e ao FAISS já carregados
+    
+    Chamado pelos pontos de entrada que usam BERT/FAISS, depois de setup_threads
+    e dos imports. O padrão é o mesmo de setup_threads (OMP_NUM_THREADS ou
+    DEFAULT_NUM_THREADS); FAISS_NUM_THREADS=1 é indicado quando o servidor já
+    paraleliza entre consultas.
+    """
+    import faiss
+    import torch
+    
+    num_threads = int(os.getenv("OMP_NUM_THREADS", DEFAULT_NUM_THREADS))
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:  # Só pode ser definido antes do primeiro trabalho paralelo
+        pass
+    faiss_threads = int(os.getenv("FAISS_NUM_THREADS", num_threads))
+    faiss.omp_set_num_threads(faiss_threads)
+    logger.info(f"PyTorch com {num_threads} threads; FAISS com {faiss_threads}")
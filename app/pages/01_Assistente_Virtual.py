@@ -9,14 +9,24 @@ os.environ['KMP_DUPLICATE_LIB_OK']='True'
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(root_dir)
 
+# Limites de threads antes de qualquer import de FAISS/PyTorch
+from app.config.threads_config import setup_threads, configure_threads
+setup_threads()
+
 import streamlit as st
 import faiss
 import pickle
+import json
 import numpy as np
 import google.generativeai as genai
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from app.utils.embeddings import EmbeddingManager
+from app.utils.semantic_cache import ResponseCache
+
+# Threads do PyTorch/FAISS (carregados pelos imports acima)
+configure_threads()
 
 # Configuração da página
 st.set_page_config(
@@ -25,32 +35,85 @@ st.set_page_config(
     layout="wide"
 )
 
+# Listas invertidas visitadas por consulta nos índices IVF (recall x latência)
+IVF_NPROBE = 16
+
+# Limites do contexto enviado ao Gemini (tokens do prompt crescem com os bytes enviados)
+MAX_CONTEXT_RESULTS = 20
+MAX_SNIPPET_CHARS = 500
+
 def get_available_indices():
     """Retorna lista de índices disponíveis"""
     index_files = Path(f"{root_dir}/data/embeddings").glob("*_index.faiss")
     indices = [Path(f).stem.replace("_index", "") for f in index_files]
     return sorted(indices)
 
+@st.cache_resource
 def load_index_and_data(name):
-    """Carrega índice FAISS e dados originais"""
-    # Carrega dados
-    with open(f"{root_dir}/data/embeddings/{name}_data.pkl", "rb") as f:
-        data = pickle.load(f)
-    
-    # Carrega índice
-    index = faiss.read_index(f"{root_dir}/data/embeddings/{name}_index.faiss")
+    """
+    Carrega índice FAISS e dados originais
+    
+    Cacheado por processo: cada índice é lido do disco uma única vez e
+    compartilhado (somente leitura) entre consultas e sessões.
+    """
+    # Carrega dados (JSON lines; o .pkl é o formato antigo)
+    jsonl_path = Path(f"{root_dir}/data/embeddings/{name}_data.jsonl")
+    if jsonl_path.exists():
+        with open(jsonl_path, encoding='utf-8') as f:
+            data = [json.loads(linha) for linha in f]
+    else:
+        with open(f"{root_dir}/data/embeddings/{name}_data.pkl", "rb") as f:
+            data = pickle.load(f)
+    
+    # Carrega índice mapeado em memória: as páginas ficam no cache do sistema
+    # e são compartilhadas entre processos (leitura completa como alternativa)
+    index_path = f"{root_dir}/data/embeddings/{name}_index.faiss"
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except Exception as e:
+        logging.warning(f"Índice {name} não suporta mmap, lendo em memória: {e}")
+        index = faiss.read_index(index_path)
+    
+    # Índices IVF: número de listas visitadas por consulta
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = IVF_NPROBE
     
     return data, index
 
-def search_all_indices(manager, query, k=10):
+@st.cache_resource
+def get_manager() -> EmbeddingManager:
+    """Retorna uma instância compartilhada de EmbeddingManager"""
+    return EmbeddingManager()
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Retorna o cache de respostas do Gemini, compartilhado entre sessões"""
+    return ResponseCache()
+
+def preload_indices():
+    """Carrega todos os índices disponíveis antes da primeira consulta"""
+    for index_name in get_available_indices():
+        try:
+            load_index_and_data(index_name)
+        except Exception as e:
+            logging.error(f"Erro ao carregar o índice {index_name}: {e}")
+
+def search_all_indices(manager, query, k=10, query_emb=None):
     """Realiza busca em todos os índices disponíveis"""
     indices = get_available_indices()
     all_results = []
     
-    # Gera embedding da query uma única vez
-    query_emb = manager.gerar_embeddings_batch([query])[0].reshape(1, -1)
+    # Gera embedding da query uma única vez (se não foi fornecido)
+    if query_emb is None:
+        query_emb = manager.gerar_embeddings_batch([query])[0]
+    # Índices L2 (app/utils/faiss_index) usam o embedding original: com vetores
+    # normalizados a ordem é a do cosseno. Índices antigos em produto interno, o normalizado
+    raw_query_emb = np.array(query_emb, dtype=np.float32).reshape(1, -1)
+    query_emb = raw_query_emb.copy()
+    faiss.normalize_L2(query_emb)
     
-    # Mapeamento de índices para prioridade (score menor = mais relevante)
+    # Mapeamento de índices para prioridade (menor = mais relevante)
     priority_map = {
         'sumarizacoes': 0.5,  # Maior prioridade para sumarizações
         'proposicoes': 1,     # Segunda maior prioridade para proposições específicas
@@ -64,36 +127,73 @@ def search_all_indices(manager, query, k=10):
     if "proposição" in query.lower() or "proposicoes" in query.lower():
         k = k * 2  # Dobra o número de resultados para consultas sobre proposições
     
-    for index_name in indices:
+    def search_index(index_name, data, index):
+        """Busca em um índice; os resultados trazem o score ajustado pela prioridade"""
+        results = []
         try:
-            data, index = load_index_and_data(index_name)
+            # Uma thread do OpenMP por busca: o paralelismo vem do pool abaixo, e
+            # o limite vale só para a thread que o define
+            faiss.omp_set_num_threads(1)
             
             # Ajusta k baseado na prioridade do índice
             index_priority = priority_map.get(index_name, 3)
-            index_k = k * (1 + (1/index_priority))  # Mais resultados para índices prioritários
+            index_k = int(k * (1 + (1/index_priority)))  # Mais resultados para índices prioritários
             
-            # Busca similares
-            D, I = index.search(query_emb, min(index_k, len(data)))
+            # Busca similares (o FAISS devolve do mais para o menos similar)
+            n = min(index_k, len(data))
+            if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                D, I = index.search(query_emb, n)
+            else:
+                D, I = index.search(raw_query_emb, n)
             
-            # Adiciona resultados válidos
-            for dist, idx in zip(D[0], I[0]):
-                if idx < len(data):
-                    # Ajusta o score baseado na prioridade do índice
-                    adjusted_score = float(dist) * index_priority
-                    all_results.append({
-                        'text': data[idx],
-                        'score': adjusted_score,
-                        'source': index_name
-                    })
+            # Resultados válidos (FAISS devolve -1 quando faltam vizinhos). Cossenos
+            # e distâncias L2 não são comparáveis entre índices: o score vem da
+            # posição no próprio índice (1, 1/2, 1/3...), ajustado pela prioridade
+            valid = (I[0] >= 0) & (I[0] < len(data))
+            results = [
+                {'text': data[idx], 'score': 1.0 / (rank + 1) / index_priority, 'source': index_name}
+                for rank, idx in enumerate(I[0][valid].tolist())
+            ]
         except Exception as e:
             logging.error(f"Erro ao buscar no índice {index_name}: {e}")
-            continue
+        return results
+    
+    # Índices carregados na thread do Streamlit (cache_resource); as buscas
+    # rodam uma por thread (o FAISS libera o GIL), cada uma com o OpenMP em 1 thread
+    loaded = []
+    for index_name in indices:
+        try:
+            loaded.append((index_name, *load_index_and_data(index_name)))
+        except Exception as e:
+            logging.error(f"Erro ao carregar o índice {index_name}: {e}")
+    
+    if loaded:
+        with ThreadPoolExecutor(max_workers=len(loaded)) as executor:
+            for results in executor.map(lambda args: search_index(*args), loaded):
+                all_results.extend(results)
     
     # Ordena todos os resultados por score ajustado
-    all_results.sort(key=lambda x: x['score'])
+    all_results.sort(key=lambda x: x['score'], reverse=True)
+    
+    # Mantém os melhores textos distintos: sumarizações e proposições se repetem entre índices
+    unique_results = []
+    seen = set()
+    for result in all_results:
+        key = " ".join(result['text'].lower().split())
+        if key in seen:
+            continue
+        seen.add(key)
+        unique_results.append(result)
+        if len(unique_results) == MAX_CONTEXT_RESULTS:
+            break
     
-    # Retorna mais resultados para dar contexto suficiente
-    return all_results[:min(len(all_results), 40)]
+    return unique_results
+
+def truncate_snippet(text, limit=MAX_SNIPPET_CHARS):
+    """Corta o texto em até limit caracteres, sem partir a última palavra"""
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + "..."
 
 def format_context(results):
     """Formata o contexto de forma estruturada"""
@@ -104,7 +204,7 @@ def format_context(results):
         source = result['source']
         if source not in context_by_source:
             context_by_source[source] = []
-        context_by_source[source].append(result['text'])
+        context_by_source[source].append(truncate_snippet(result['text']))
     
     # Formata o contexto
     formatted_parts = []
@@ -135,11 +235,7 @@ def format_context(results):
     
     return "\n".join(formatted_parts)
 
-def get_gemini_response(query, context):
-    """Gera resposta usando Gemini"""
-    model = genai.GenerativeModel('gemini-pro')
-    
-    SYSTEM_PROMPT = """Você é um especialista em análise legislativa da Câmara dos Deputados, com foco especial em proposições e seus impactos.
+SYSTEM_PROMPT = """Você é um especialista em análise legislativa da Câmara dos Deputados, com foco especial em proposições e seus impactos.
     Como analista experiente, você deve usar a técnica Self-Ask para estruturar seu raciocínio:
 
     1. ANÁLISE HIERÁRQUICA COM SELF-ASK:
@@ -179,7 +275,7 @@ def get_gemini_response(query, context):
     
     Lembre-se: Mantenha o foco nas proposições e seus impactos."""
 
-    USER_PROMPT = """Pergunta: {query}
+USER_PROMPT = """Pergunta: {query}
 
     Contexto disponível:
     {context}
@@ -206,9 +302,30 @@ def get_gemini_response(query, context):
     - Identifique padrões
     - Analise impactos potenciais"""
 
-    prompt = SYSTEM_PROMPT + "\n\n" + USER_PROMPT.format(query=query, context=context)
+# Template completo montado uma única vez; por consulta resta apenas o format
+PROMPT_TEMPLATE = SYSTEM_PROMPT + "\n\n" + USER_PROMPT
+
+@st.cache_resource
+def get_gemini_model():
+    """Retorna o modelo Gemini compartilhado (cliente criado uma única vez)"""
+    return genai.GenerativeModel('gemini-pro')
+
+def get_gemini_response(query, context):
+    """
+    Gera resposta usando Gemini
+    
+    Consulta antes o cache de respostas (mesma pergunta com o mesmo contexto).
+    """
+    prompt = PROMPT_TEMPLATE.format(query=query, context=context)
+    
+    cache = get_response_cache()
+    cached = cache.get(prompt)
+    if cached is not None:
+        return cached
     
-    response = model.generate_content(prompt)
+    response = get_gemini_model().generate_content(prompt)
+    
+    cache.put(prompt, response.text)
     return response.text
 
 def main():
@@ -222,6 +339,9 @@ def main():
     - 📊 Análises e insights
     """)
     
+    # Paga o custo de leitura dos índices uma única vez, antes das consultas
+    preload_indices()
+    
     # Inicializa o histórico de chat se não existir
     if "messages" not in st.session_state:
         st.session_state.messages = []
@@ -241,16 +361,19 @@ def main():
         # Mostra indicador de "pensando"
         with st.chat_message("assistant"):
             with st.spinner("Buscando informações..."):
-                # Inicializa manager
-                manager = EmbeddingManager()
+                # Manager compartilhado (modelo carregado uma única vez)
+                manager = get_manager()
+                
+                # Embedding da pergunta, gerado uma única vez para a busca
+                query_emb = manager.gerar_embeddings_batch([prompt])[0]
                 
                 # Busca em todos os índices
-                results = search_all_indices(manager, prompt)
+                results = search_all_indices(manager, prompt, query_emb=query_emb)
                 
                 # Formata o contexto de forma estruturada
                 context = format_context(results)
                 
-                # Gera resposta
+                # Gera resposta (ou reaproveita uma já gerada)
                 response = get_gemini_response(prompt, context)
                 
                 # Adiciona resposta ao histórico
@@ -6,6 +6,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Any, Tuple
 import logging
+import bisect
+import itertools
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
@@ -25,7 +27,19 @@ class AnalyticsEngine:
     
     def __init__(self, data_loader):
         self.data_loader = data_loader
-        self.insights: List[Insight] = []
+        # (-importance, ordem de inserção, insight) mantidos ordenados na inserção:
+        # o mais importante fica no início
+        self._entries: List[Tuple[int, int, Insight]] = []
+        self._counter = itertools.count()
+    
+    @property
+    def insights(self) -> List[Insight]:
+        """Insights gerados, do mais para o menos importante"""
+        return [entry[2] for entry in self._entries]
+    
+    def _add_insight(self, insight: Insight) -> None:
+        """Adiciona um insight mantendo a ordenação por importância"""
+        bisect.insort(self._entries, (-insight.importance, next(self._counter), insight))
     
     def detect_outliers(self, df: pd.DataFrame, column: str, threshold: float = 3) -> pd.DataFrame:
         """Detecta outliers usando o método do z-score"""
@@ -46,16 +60,16 @@ class AnalyticsEngine:
             # Métricas de despesas
             if self.data_loader.despesas_df is not None:
                 df_desp = self.data_loader.despesas_df
-                metrics['media_mensal_despesas'] = df_desp.groupby(
-                    pd.Grouper(key='dataDocumento', freq='M')
-                )['valorDocumento'].mean()
+                metrics['media_mensal_despesas'] = df_desp.set_index(
+                    'dataDocumento'
+                ).resample('M')['valorDocumento'].mean()
                 
-                # Tendência linear simples
-                values = metrics['media_mensal_despesas'].values
-                if len(values) > 1:
-                    x = np.arange(len(values))
-                    coeffs = np.polyfit(x, values, 1)
-                    metrics['tendencia_despesas'] = coeffs[0]
+                # Tendência linear simples (inclinação em forma fechada: cov(x, y) / var(x))
+                y = metrics['media_mensal_despesas'].to_numpy(dtype=np.float64)
+                if y.size > 1:
+                    x = np.arange(y.size, dtype=np.float64)
+                    x -= x.mean()
+                    metrics['tendencia_despesas'] = float((x * (y - y.mean())).sum() / (x * x).sum())
                 
             # Métricas de proposições
             if self.data_loader.proposicoes_df is not None:
@@ -101,7 +115,7 @@ class AnalyticsEngine:
         """Gera insights baseados nas análises"""
         try:
             # Limpa insights anteriores
-            self.insights = []
+            self._entries = []
             
             # 1. Análise de Despesas
             if self.data_loader.despesas_df is not None:
@@ -109,7 +123,7 @@ class AnalyticsEngine:
                 outliers = self.detect_outliers(df_desp, 'valorDocumento')
                 
                 if len(outliers) > 0:
-                    self.insights.append(Insight(
+                    self._add_insight(Insight(
                         title="Despesas Atípicas Detectadas",
                         description=f"Foram identificadas {len(outliers)} despesas com valores significativamente diferentes do padrão.",
                         importance=4,
@@ -130,7 +144,7 @@ class AnalyticsEngine:
                     aprovadas = len(df_prop[df_prop['status'] == 'APROVADA'])
                     taxa_aprovacao = aprovadas / total
                     
-                    self.insights.append(Insight(
+                    self._add_insight(Insight(
                         title="Efetividade Legislativa",
                         description=f"A taxa de aprovação de proposições é de {taxa_aprovacao:.1%}",
                         importance=3,
@@ -145,7 +159,7 @@ class AnalyticsEngine:
             # 3. Análise de Correlações
             correlations = self.find_correlations()
             if correlations:
-                self.insights.append(Insight(
+                self._add_insight(Insight(
                     title="Relação entre Gastos e Produtividade",
                     description=f"Correlação entre despesas e número de proposições: {correlations.get('despesas_vs_proposicoes', 0):.2f}",
                     importance=5,
@@ -157,7 +171,7 @@ class AnalyticsEngine:
                     ]
                 ))
 
-            return sorted(self.insights, key=lambda x: x.importance, reverse=True)
+            return self.insights
         
         except Exception as e:
             logger.error(f"Erro na geração de insights: {str(e)}")
@@ -165,4 +179,4 @@ class AnalyticsEngine:
 
     def get_top_insights(self, n: int = 5) -> List[Insight]:
         """Retorna os N insights mais importantes"""
-        return sorted(self.insights, key=lambda x: x.importance, reverse=True)[:n]
+        return [entry[2] for entry in self._entries[:n]]
@@ -4,6 +4,7 @@ Módulo responsável pela interface de chat do dashboard
 
 import streamlit as st
 import logging
+from collections import deque
 from typing import List, Dict, Optional
 from pathlib import Path
 from .self_ask import SelfAskAssistant
@@ -11,6 +12,9 @@ from .self_ask import SelfAskAssistant
 # Configuração de logging
 logger = logging.getLogger(__name__)
 
+# Número máximo de mensagens mantidas (e renderizadas) no histórico
+MAX_CHAT_HISTORY = 50
+
 class ChatInterface:
     """Classe responsável pela interface de chat"""
     
@@ -30,7 +34,7 @@ class ChatInterface:
         logger.info("Inicializando estado da sessão...")
         
         if 'chat_history' not in st.session_state:
-            st.session_state.chat_history = []
+            st.session_state.chat_history = deque(maxlen=MAX_CHAT_HISTORY)
             logger.info("Histórico do chat inicializado")
             
         if 'chat_assistant' not in st.session_state:
@@ -5,9 +5,10 @@ Módulo responsável por análises estatísticas dos dados da Câmara
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from functools import cached_property
 import logging
 from typing import Dict, List, Any, Tuple
-from .data_loader import DataLoader
+from .data_loader import get_default_loader
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ class DataAnalyzer:
     
     def __init__(self):
         """Inicializa o analisador de dados"""
-        self.data_loader = DataLoader()
+        self.data_loader = get_default_loader()
         self._load_data()
         
     def _load_data(self):
@@ -24,44 +25,57 @@ class DataAnalyzer:
         self.deputados_df = self.data_loader.load_deputados()
         self.proposicoes_df = self.data_loader.load_proposicoes()
         self.despesas_df = self.data_loader.load_despesas()
+    
+    @cached_property
+    def _dep_lookup(self) -> pd.DataFrame:
+        """Nome e partido dos deputados indexados por id (calculado uma única vez)"""
+        return self.deputados_df.set_index('id')[['nome', 'siglaPartido']]
         
     def analyze_partido_distribution(self) -> Dict[str, Any]:
         """Analisa a distribuição de deputados por partido"""
         try:
-            # Contagem por partido
+            # Contagem por partido (maiores primeiro: a distribuição é exibida nesta ordem)
             partido_counts = self.deputados_df['siglaPartido'].value_counts()
             total_deputados = len(self.deputados_df)
             
             # Calcula percentuais
             partido_percentual = (partido_counts / total_deputados * 100).round(2)
             
+            # Maior e menor partido
+            maior = partido_counts.index[0]
+            menor = partido_counts.index[-1]
+            
             # Prepara resultado
             resultado = {
                 'total_deputados': total_deputados,
                 'total_partidos': len(partido_counts),
                 'maior_partido': {
-                    'sigla': partido_counts.index[0],
-                    'quantidade': int(partido_counts.iloc[0]),
-                    'percentual': float(partido_percentual.iloc[0])
+                    'sigla': maior,
+                    'quantidade': int(partido_counts[maior]),
+                    'percentual': float(partido_percentual[maior])
                 },
                 'menor_partido': {
-                    'sigla': partido_counts.index[-1],
-                    'quantidade': int(partido_counts.iloc[-1]),
-                    'percentual': float(partido_percentual.iloc[-1])
+                    'sigla': menor,
+                    'quantidade': int(partido_counts[menor]),
+                    'percentual': float(partido_percentual[menor])
                 },
                 'distribuicao': [
                     {
                         'partido': partido,
                         'deputados': int(count),
-                        'percentual': float(partido_percentual[partido])
+                        'percentual': float(pct)
                     }
-                    for partido, count in partido_counts.items()
+                    for partido, count, pct in zip(
+                        partido_counts.index.to_numpy(),
+                        partido_counts.to_numpy(),
+                        partido_percentual.to_numpy()
+                    )
                 ],
                 'insights': [
-                    f"O {partido_counts.index[0]} é o maior partido com {partido_counts.iloc[0]} deputados ({partido_percentual.iloc[0]:.1f}% do total)",
+                    f"O {maior} é o maior partido com {partido_counts[maior]} deputados ({partido_percentual[maior]:.1f}% do total)",
                     f"Existem {len(partido_counts)} partidos representados na Câmara",
-                    f"Os 5 maiores partidos representam {partido_percentual.head(5).sum():.1f}% dos deputados",
-                    f"O menor partido é o {partido_counts.index[-1]} com {partido_counts.iloc[-1]} deputado(s)"
+                    f"Os 5 maiores partidos representam {partido_percentual.nlargest(5).sum():.1f}% dos deputados",
+                    f"O menor partido é o {menor} com {partido_counts[menor]} deputado(s)"
                 ]
             }
             
@@ -81,8 +95,9 @@ class DataAnalyzer:
             # Renomeia as colunas
             despesas_grupo.columns = ['total', 'quantidade', 'media']
             
-            # Ordena por valor total
+            # Ordena por valor total (uma linha por tipo de despesa)
             despesas_grupo = despesas_grupo.sort_values('total', ascending=False)
+            maior_tipo = despesas_grupo.index[0]
             
             # Calcula totais gerais
             total_geral = float(self.despesas_df['valorDocumento'].sum())
@@ -92,20 +107,26 @@ class DataAnalyzer:
                 'total_geral': total_geral,
                 'total_lancamentos': len(self.despesas_df),
                 'maior_tipo_despesa': {
-                    'tipo': despesas_grupo.index[0],
-                    'total': float(despesas_grupo['total'].iloc[0]),
-                    'quantidade': int(despesas_grupo['quantidade'].iloc[0]),
-                    'media': float(despesas_grupo['media'].iloc[0])
+                    'tipo': maior_tipo,
+                    'total': float(despesas_grupo.at[maior_tipo, 'total']),
+                    'quantidade': int(despesas_grupo.at[maior_tipo, 'quantidade']),
+                    'media': float(despesas_grupo.at[maior_tipo, 'media'])
                 },
                 'por_tipo': [
                     {
                         'tipo': tipo,
-                        'total': float(row['total']),
-                        'quantidade': int(row['quantidade']),
-                        'media': float(row['media']),
-                        'percentual': float(row['total'] / total_geral * 100)
+                        'total': float(total),
+                        'quantidade': int(quantidade),
+                        'media': float(media),
+                        'percentual': float(pct)
                     }
-                    for tipo, row in despesas_grupo.iterrows()
+                    for tipo, total, quantidade, media, pct in zip(
+                        despesas_grupo.index.to_numpy(),
+                        despesas_grupo['total'].to_numpy(),
+                        despesas_grupo['quantidade'].to_numpy(),
+                        despesas_grupo['media'].to_numpy(),
+                        despesas_grupo['total'].to_numpy() / total_geral * 100
+                    )
                 ]
             }
             
@@ -117,39 +138,35 @@ class DataAnalyzer:
     def analyze_deputado_despesas(self) -> Dict[str, Any]:
         """Analisa despesas por deputado"""
         try:
-            # Merge com dados dos deputados
-            despesas_dep = pd.merge(
-                self.despesas_df,
-                self.deputados_df[['id', 'nome', 'siglaPartido']],
-                on='id'
-            )
-            
-            # Agrupamento por deputado
-            deputado_despesas = despesas_dep.groupby(
-                ['id', 'nome', 'siglaPartido']
+            # Agrupamento por deputado usando apenas a chave
+            deputado_despesas = self.despesas_df.groupby(
+                'idDeputado'
             )['valorDocumento'].agg(['sum', 'count', 'mean']).round(2)
             
-            # Ordena por valor total
-            deputado_despesas = deputado_despesas.sort_values('sum', ascending=False)
+            # Anexa nome e partido pelo índice dos deputados (um registro por deputado)
+            deputado_despesas = deputado_despesas.join(self._dep_lookup, how='inner')
+            
+            # Seleciona os 10 maiores gastos sem ordenar todo o agregado
+            top_10 = deputado_despesas.nlargest(10, 'sum')
             
             # Prepara resultado
             resultado = {
                 'maior_gastador': {
-                    'nome': deputado_despesas.index[0][1],
-                    'partido': deputado_despesas.index[0][2],
-                    'total': float(deputado_despesas['sum'].iloc[0]),
-                    'quantidade': int(deputado_despesas['count'].iloc[0]),
-                    'media': float(deputado_despesas['mean'].iloc[0])
+                    'nome': top_10['nome'].iloc[0],
+                    'partido': top_10['siglaPartido'].iloc[0],
+                    'total': float(top_10['sum'].iloc[0]),
+                    'quantidade': int(top_10['count'].iloc[0]),
+                    'media': float(top_10['mean'].iloc[0])
                 },
                 'top_10': [
                     {
-                        'nome': nome,
-                        'partido': partido,
+                        'nome': row['nome'],
+                        'partido': row['siglaPartido'],
                         'total': float(row['sum']),
                         'quantidade': int(row['count']),
                         'media': float(row['mean'])
                     }
-                    for (id_, nome, partido), row in deputado_despesas.head(10).iterrows()
+                    for _, row in top_10.iterrows()
                 ]
             }
             
@@ -161,10 +178,11 @@ class DataAnalyzer:
     def analyze_proposicoes_tema(self, tema: str) -> Dict[str, Any]:
         """Analisa proposições por tema"""
         try:
-            # Filtra por tema
-            tema_mask = self.proposicoes_df['tema'].str.contains(
-                tema, case=False, na=False
-            )
+            # Filtra por tema: avalia o padrão uma vez por categoria, não por linha
+            temas = self.proposicoes_df['tema'].astype('category')
+            hit = temas.cat.categories.str.contains(tema, case=False, na=False)
+            # Código -1 (valor ausente) cai no False acrescentado ao final
+            tema_mask = np.append(np.asarray(hit, dtype=bool), False)[temas.cat.codes.to_numpy()]
             proposicoes_tema = self.proposicoes_df[tema_mask]
             
             # Prepara resultado
@@ -7,17 +7,19 @@ import json
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import streamlit as st
 import logging
+import threading
 
-# Configuração básica de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# O logging é configurado pelo ponto de entrada (ver app/config/logging_config.py)
 logger = logging.getLogger(__name__)
 
+# Colunas de despesas efetivamente usadas pelas análises
+DESPESAS_COLUMNS = ('idDeputado', 'nomeDeputado', 'tipoDespesa', 'dataDocumento', 'valorDocumento')
+
+__all__ = ['DataLoader', 'DataLoadError', 'get_default_loader']
+
 class DataLoadError(Exception):
     """Erro ao carregar dados"""
     pass
@@ -52,10 +54,14 @@ def _load_json_file(file_path: str) -> List[Dict[str, Any]]:
         raise DataLoadError(error_msg)
 
 @st.cache_data
-def _load_parquet_file(file_path: str) -> pd.DataFrame:
-    """Carrega arquivo parquet com cache"""
+def _load_parquet_file(file_path: str, columns: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
+    """Carrega arquivo parquet com cache, lendo apenas as colunas informadas"""
     try:
-        return pd.read_parquet(file_path)
+        return pd.read_parquet(
+            file_path,
+            columns=list(columns) if columns is not None else None,
+            engine='pyarrow'
+        )
     except Exception as e:
         error_msg = f"Erro ao carregar arquivo parquet: {str(e)}"
         logger.error(error_msg)
@@ -85,6 +91,14 @@ class DataLoader:
         self.deputados_df = None
         self.proposicoes_df = None
         self.despesas_df = None
+        # Métricas pré-calculadas no carregamento
+        self._deputados_count = 0
+        self._proposicoes_count = 0
+        self._despesas_count = 0
+        self._despesas_mean = 0
+        # load_all_data roda uma única vez, mesmo com a instância compartilhada
+        self._loaded = False
+        self._load_lock = threading.Lock()
     
     def load_config(self) -> Dict[str, Any]:
         """Carrega o arquivo de configuração YAML com cache"""
@@ -108,6 +122,7 @@ class DataLoader:
         with st.spinner('Carregando dados dos deputados...'):
             file_path = str(self.data_dir / "processed" / "deputados.parquet")
             self.deputados_df = _load_parquet_file(file_path)
+            self._deputados_count = len(self.deputados_df)
             logger.info("Dados dos deputados carregados com sucesso")
             return self.deputados_df
 
@@ -116,6 +131,9 @@ class DataLoader:
         with st.spinner('Carregando dados das proposições...'):
             file_path = str(self.data_dir / "processed" / "proposicoes_deputados.parquet")
             self.proposicoes_df = _load_parquet_file(file_path)
+            # Poucos temas distintos: categórico permite filtrar por categoria
+            self.proposicoes_df['tema'] = self.proposicoes_df['tema'].astype('category')
+            self._proposicoes_count = len(self.proposicoes_df)
             logger.info("Dados das proposições carregados com sucesso")
             return self.proposicoes_df
 
@@ -123,28 +141,37 @@ class DataLoader:
         """Carrega dados das despesas"""
         with st.spinner('Carregando dados das despesas...'):
             file_path = str(self.data_dir / "processed" / "serie_despesas_diarias_deputados.parquet")
-            self.despesas_df = _load_parquet_file(file_path)
+            self.despesas_df = _load_parquet_file(file_path, columns=DESPESAS_COLUMNS)
+            # Garante datetime64 para que resample/Grouper não precisem reconverter
+            if not pd.api.types.is_datetime64_any_dtype(self.despesas_df['dataDocumento']):
+                self.despesas_df['dataDocumento'] = pd.to_datetime(self.despesas_df['dataDocumento'])
+            self._despesas_count = len(self.despesas_df)
+            self._despesas_mean = float(self.despesas_df['valorDocumento'].to_numpy().mean()) if self._despesas_count else 0
             logger.info("Dados das despesas carregados com sucesso")
             return self.despesas_df
 
     def load_all_data(self) -> None:
-        """Carrega todos os dados necessários"""
-        try:
-            self.load_config()
-            self.load_insights()
-            self.load_deputados()
-            self.load_proposicoes()
-            self.load_despesas()
-            
-            # Verifica se os dados principais foram carregados
-            if self.deputados_df is None or self.deputados_df.empty:
-                raise DataLoadError("Falha ao carregar dados dos deputados")
+        """Carrega todos os dados necessários (chamadas seguintes não recarregam)"""
+        with self._load_lock:
+            if self._loaded:
+                return
+            try:
+                self.load_config()
+                self.load_insights()
+                self.load_deputados()
+                self.load_proposicoes()
+                self.load_despesas()
+                
+                # Verifica se os dados principais foram carregados
+                if self.deputados_df is None or self.deputados_df.empty:
+                    raise DataLoadError("Falha ao carregar dados dos deputados")
+                    
+                self._loaded = True
+                logger.info("Todos os dados foram carregados com sucesso")
                 
-            logger.info("Todos os dados foram carregados com sucesso")
-            
-        except Exception as e:
-            logger.error(f"Erro ao carregar dados: {str(e)}")
-            raise DataLoadError(f"Falha ao carregar dados: {str(e)}")
+            except Exception as e:
+                logger.error(f"Erro ao carregar dados: {str(e)}")
+                raise DataLoadError(f"Falha ao carregar dados: {str(e)}")
     
     def get_image_path(self, image_name: str) -> Optional[Path]:
         """Retorna o caminho para uma imagem com verificação de existência"""
@@ -157,20 +184,19 @@ class DataLoader:
 
     def get_metricas_principais(self) -> Dict[str, Any]:
         """Retorna as métricas principais para o dashboard"""
-        try:
-            total_deputados = len(self.deputados_df) if self.deputados_df is not None else 0
-            media_gastos = self.despesas_df['valorDocumento'].mean() if self.despesas_df is not None else 0
-            total_proposicoes = len(self.proposicoes_df) if self.proposicoes_df is not None else 0
-            
-            return {
-                "Total de Deputados": total_deputados,
-                "Média de Gastos": media_gastos,
-                "Total de Proposições": total_proposicoes
-            }
-        except Exception as e:
-            logger.error(f"Erro ao calcular métricas principais: {str(e)}")
-            return {
-                "Total de Deputados": 0,
-                "Média de Gastos": 0,
-                "Total de Proposições": 0
-            }
+        return {
+            "Total de Deputados": self._deputados_count,
+            "Média de Gastos": self._despesas_mean,
+            "Total de Proposições": self._proposicoes_count
+        }
+
+@st.cache_resource
+def get_default_loader() -> DataLoader:
+    """
+    Retorna uma instância compartilhada de DataLoader
+    
+    A mesma instância atende todas as sessões do Streamlit: carregue os dados
+    com load_all_data (executado uma única vez) e trate os atributos e
+    DataFrames como somente leitura depois disso, sem chamar os load_* de novo.
+    """
+    return DataLoader()
@@ -40,6 +40,9 @@ class DeputadosEmbeddings:
                 
                 # Processa e salva embeddings
                 self.manager.process_data(data, text_fields)
+            else:
+                # Índice já existe: pré-carrega para a primeira consulta
+                self.manager.warmup()
                 
             logger.info("Dados dos deputados carregados com sucesso")
             
@@ -3,13 +3,16 @@ Módulo responsável pelo gerenciamento de embeddings das despesas
 """
 
 import torch
-from transformers import AutoTokenizer, AutoModel
 import faiss
 import numpy as np
 import pandas as pd
 import logging
 from typing import List, Dict, Any
 from pathlib import Path
+from .embedding_manager import (
+    default_device, get_bert, inference_autocast, to_device, bert_forward,
+    create_index, add_to_index, length_bucketed_batches, concat_text_fields, EmbeddingCollector
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,14 +24,15 @@ class DespesasEmbeddings:
         self.model_name = "neuralmind/bert-base-portuguese-cased"
         self.tokenizer = None
         self.model = None
+        self.device = default_device()
         self.index = None
         self.despesas_data = []
+        self._id_to_idx = {}
         
     def initialize_bert(self):
         """Inicializa o modelo BERT e tokenizer"""
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModel.from_pretrained(self.model_name)
+            self.tokenizer, self.model = get_bert(self.model_name, self.device)
             logger.info("Modelo BERT inicializado com sucesso")
         except Exception as e:
             logger.error(f"Erro ao inicializar BERT: {str(e)}")
@@ -39,19 +43,43 @@ class DespesasEmbeddings:
         try:
             # Tokeniza e prepara o input
             inputs = self.tokenizer(text, return_tensors="pt", 
-                                  max_length=512, truncation=True, padding=True)
+                                  max_length=512, truncation=True)
             
             # Gera o embedding
-            with torch.no_grad():
-                outputs = self.model(**inputs)
+            inputs = to_device(inputs, self.device)
+            with torch.inference_mode(), inference_autocast(self.device):
+                hidden = bert_forward(self.model, inputs)
                 
             # Usa a média do último hidden state como embedding
-            embeddings = outputs.last_hidden_state.mean(dim=1).numpy()
+            embeddings = hidden.mean(dim=1).float().cpu().numpy()
             return embeddings[0]
         except Exception as e:
             logger.error(f"Erro ao gerar embedding: {str(e)}")
             raise
             
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Gera embeddings para uma lista de textos em lotes"""
+        try:
+            # Lotes ordenados por comprimento para minimizar o padding
+            order, batches = length_bucketed_batches(self.tokenizer, texts, batch_size)
+            
+            collector = EmbeddingCollector(order, self.device, batch_size)
+            for inputs in batches:
+                inputs = to_device(inputs, self.device)
+                with torch.inference_mode(), inference_autocast(self.device):
+                    hidden = bert_forward(self.model, inputs)
+                    
+                    # Média do último hidden state ignorando os tokens de padding
+                    hidden = hidden.float()
+                    mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                    summed = (hidden * mask).sum(dim=1)
+                    collector.add(summed / mask.sum(dim=1).clamp(min=1))
+            
+            return collector.result()
+        except Exception as e:
+            logger.error(f"Erro ao gerar embeddings em lote: {str(e)}")
+            raise
+            
     def process_despesas(self, despesas: List[Dict[str, Any]]):
         """Processa as despesas e cria índice FAISS"""
         try:
@@ -62,23 +90,24 @@ class DespesasEmbeddings:
             if not isinstance(despesas, pd.DataFrame):
                 despesas = pd.DataFrame(despesas)
                 
-            # Prepara os dados
+            # Prepara os dados e o mapa id -> posição no índice FAISS
             self.despesas_data = despesas
-            embeddings = []
-            
-            # Gera embeddings para cada despesa
-            for _, desp in despesas.iterrows():
-                # Combina informações relevantes da despesa
-                texto = f"{desp.get('tipoDespesa', '')} {desp.get('dataDocumento', '')} {desp.get('nomeFornecedor', '')} {desp.get('valorDocumento', '')}"
-                embedding = self.generate_embedding(texto)
-                embeddings.append(embedding)
+            if 'id' in despesas.columns:
+                self._id_to_idx = {v: i for i, v in enumerate(despesas['id'].to_numpy())}
+            
+            # Combina informações relevantes de cada despesa
+            textos = concat_text_fields(
+                despesas, ['tipoDespesa', 'dataDocumento', 'nomeFornecedor', 'valorDocumento']
+            )
+            
+            # Gera os embeddings em lotes
+            embeddings_array = self.generate_embeddings_batch(textos).astype('float32')
                 
             # Cria índice FAISS
-            embeddings_array = np.array(embeddings).astype('float32')
             dimension = embeddings_array.shape[1]
             
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(embeddings_array)
+            self.index = create_index(dimension, len(embeddings_array))
+            add_to_index(self.index, embeddings_array)
             
             logger.info(f"Processadas {len(despesas)} despesas")
             
@@ -101,7 +130,7 @@ class DespesasEmbeddings:
             # Retorna as despesas encontradas
             similar_despesas = []
             for i, idx in enumerate(I[0]):
-                if idx < len(self.despesas_data):
+                if 0 <= idx < len(self.despesas_data):
                     despesa = self.despesas_data.iloc[idx].to_dict()
                     despesa['similarity_score'] = float(D[0][i])
                     similar_despesas.append(despesa)
@@ -115,10 +144,10 @@ class DespesasEmbeddings:
     def get_embedding(self, desp_id: str) -> np.ndarray:
         """Recupera o embedding de uma despesa específica"""
         try:
-            if desp_id in self.despesas_data['id'].values:
-                idx = self.despesas_data[self.despesas_data['id'] == desp_id].index[0]
-                return np.array(self.index.reconstruct(int(idx)))
-            return None
+            idx = self._id_to_idx.get(desp_id)
+            if idx is None:
+                return None
+            return self.index.reconstruct(idx)
         except Exception as e:
             logger.error(f"Erro ao recuperar embedding: {str(e)}")
             return None
@@ -3,18 +3,322 @@ Módulo responsável pelo gerenciamento e persistência de embeddings
 """
 
 import torch
+import transformers
 from transformers import AutoTokenizer, AutoModel
 import faiss
 import numpy as np
 import pandas as pd
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 import pickle
 import os
+import hashlib
+import threading
+from functools import lru_cache
+from .faiss_index import (
+    SQ_THRESHOLD, HNSW_THRESHOLD, HNSW_EF_SEARCH, create_index, index_type_for, add_to_index
+)
 
 logger = logging.getLogger(__name__)
 
+# Quantidade de textos tokenizados mantidos em cache por gerenciador
+TOKENIZER_CACHE_SIZE = 10_000
+
+try:
+    import intel_extension_for_pytorch as ipex
+except ImportError:  # Extensão opcional: sem ela o BERT roda em FP32
+    ipex = None
+
+try:
+    from optimum.bettertransformer import BetterTransformer
+except ImportError:  # Opcional: atenção que ignora tokens de padding
+    BetterTransformer = None
+
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig, OptimizationConfig
+except ImportError:  # Opcional: backend ONNX Runtime
+    ORTModelForFeatureExtraction = None
+
+# Backend de inferência do BERT: torch (padrão) ou onnx (ONNX Runtime via optimum)
+EMBED_BACKEND = os.getenv('EMBED_BACKEND', 'torch').lower()
+
+# Precisão do BERT: int8 (quantização dinâmica), bf16 (requer IPEX) ou fp32
+EMBED_DTYPE = os.getenv('EMBED_DTYPE', 'bf16' if ipex is not None else 'fp32').lower()
+_USE_BF16 = EMBED_DTYPE == 'bf16' and ipex is not None
+
+# Similaridade mínima entre as saídas FP32 e INT8 para aceitar a quantização
+INT8_MIN_COSINE = 0.98
+
+def _quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Quantiza dinamicamente as camadas Linear em INT8, validando o desvio numérico"""
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    # Compara o [CLS] das duas versões em uma amostra sintética
+    sample = torch.randint(0, model.config.vocab_size, (4, 64))
+    mask = torch.ones_like(sample)
+    with torch.inference_mode():
+        ref = model(sample, mask)[0][:, 0, :]
+        out = quantized(sample, mask)[0][:, 0, :]
+    cosine = torch.nn.functional.cosine_similarity(ref, out).min().item()
+    
+    if cosine < INT8_MIN_COSINE:
+        logger.warning(f"Quantização INT8 descartada (similaridade mínima {cosine:.4f}); usando FP32")
+        return model
+    logger.info(f"BERT quantizado em INT8 (similaridade mínima {cosine:.4f})")
+    return quantized
+
+def _to_bettertransformer(model: torch.nn.Module) -> torch.nn.Module:
+    """Converte o encoder para BetterTransformer (SDPA sem custo nos tokens de padding)"""
+    if BetterTransformer is None:
+        return model
+    try:
+        model = BetterTransformer.transform(model)
+        logger.info("BERT convertido para BetterTransformer")
+    except Exception as e:
+        logger.warning(f"BetterTransformer não suportado para este modelo: {e}")
+    return model
+
+def optimize_bert(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Otimiza o BERT para CPU conforme EMBED_DTYPE
+    
+    Em bf16 usa ipex.fast_bert (encoder BERT específico do IPEX) e, se a versão
+    do IPEX/transformers não o suportar, recorre a ipex.optimize. O ganho do
+    BF16 depende de CPUs com AVX-512 BF16 ou AMX. Em int8 aplica quantização
+    dinâmica das camadas Linear. Em fp32 usa BetterTransformer, se instalado.
+    """
+    if EMBED_DTYPE == 'int8':
+        return _quantize_int8(model)
+    if not _USE_BF16:
+        return _to_bettertransformer(model)
+    if hasattr(ipex, 'fast_bert'):
+        try:
+            logger.info("Aplicando ipex.fast_bert (BF16) ao modelo BERT")
+            return ipex.fast_bert(model, dtype=torch.bfloat16)
+        except Exception as e:
+            logger.warning(f"ipex.fast_bert indisponível para esta versão do transformers: {e}")
+    logger.info("Aplicando ipex.optimize (BF16) ao modelo BERT")
+    return ipex.optimize(model, dtype=torch.bfloat16)
+
+def bf16_autocast():
+    """Contexto de autocast BF16 na CPU (ativo apenas quando EMBED_DTYPE=bf16 e o IPEX está instalado)"""
+    return torch.cpu.amp.autocast(dtype=torch.bfloat16, enabled=_USE_BF16)
+
+def default_device() -> torch.device:
+    """GPU quando disponível, senão CPU"""
+    return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+def inference_autocast(device: torch.device):
+    """Autocast do dispositivo: FP16 na GPU (tensor cores), BF16 na CPU quando ativo"""
+    if device.type == 'cuda':
+        return torch.autocast('cuda', dtype=torch.float16)
+    return bf16_autocast()
+
+# Módulos TorchScript traçados, reaproveitados entre execuções (na raiz do
+# projeto, independente do diretório de trabalho)
+TORCHSCRIPT_DIR = Path(__file__).resolve().parents[2] / "data" / "embeddings" / "torchscript"
+TRACE_SHAPE = (2, 512)
+# Segunda forma, usada apenas para verificar que o trace não fixou o comprimento
+CHECK_SHAPE = (3, 64)
+
+def trace_bert(model: torch.nn.Module, model_name: str, device: Optional[torch.device] = None) -> torch.nn.Module:
+    """
+    Converte o BERT em um módulo TorchScript congelado e otimizado para inferência
+    
+    O trace é salvo em disco por (modelo, comprimento, dtype, dispositivo e
+    versões do torch e do transformers) para não ser refeito, e é conferido
+    contra uma segunda forma (CHECK_SHAPE). O
+    modelo deve ter sido carregado com torchscript=True. Em caso de falha,
+    retorna o modelo original (modo eager) e registra um aviso.
+    """
+    if getattr(model, 'use_bettertransformer', False):
+        logger.warning("TorchScript não suporta o encoder BetterTransformer; BERT segue em modo eager")
+        return model
+    device = device or torch.device('cpu')
+    dtype = EMBED_DTYPE if device.type == 'cpu' else 'fp16'
+    # As versões entram no nome: após uma atualização o trace antigo não é reaproveitado
+    versions = f"torch{torch.__version__}_transformers{transformers.__version__}"
+    cache_path = TORCHSCRIPT_DIR / (
+        f"{model_name.replace('/', '_')}_{TRACE_SHAPE[1]}_{dtype}_{device.type}_{versions}.pt"
+    )
+    try:
+        input_ids = torch.randint(0, model.config.vocab_size, TRACE_SHAPE, device=device)
+        attention_mask = torch.ones(TRACE_SHAPE, dtype=torch.long, device=device)
+        check_inputs = [(
+            torch.randint(0, model.config.vocab_size, CHECK_SHAPE, device=device),
+            torch.ones(CHECK_SHAPE, dtype=torch.long, device=device),
+        )]
+        # no_grad (e não inference_mode): tensores de inferência não podem ser gravados no grafo
+        with torch.no_grad(), inference_autocast(device):
+            if cache_path.exists():
+                traced = torch.jit.load(str(cache_path), map_location=device)
+            else:
+                traced = torch.jit.trace(model, (input_ids, attention_mask), strict=False,
+                                         check_trace=True, check_inputs=check_inputs)
+                TORCHSCRIPT_DIR.mkdir(parents=True, exist_ok=True)
+                torch.jit.save(traced, str(cache_path))
+            traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+            # Aquecimento para o oneDNN escolher os kernels
+            for _ in range(2):
+                traced(input_ids, attention_mask)
+        logger.info(f"BERT convertido para TorchScript ({cache_path.name})")
+        return traced
+    except Exception as e:
+        logger.warning(f"Não foi possível gerar o TorchScript do BERT, usando modo eager: {e}")
+        return model
+
+def length_bucketed_batches(tokenizer, texts: List[str], batch_size: int, max_length: int = 512):
+    """
+    Tokeniza os textos e os agrupa em lotes de comprimento semelhante
+    
+    Returns:
+        Tupla (order, lotes): order é a permutação aplicada aos textos e cada
+        lote traz padding apenas até o maior texto do próprio lote
+    """
+    encodings = tokenizer(list(texts), max_length=max_length, truncation=True)
+    lengths = np.fromiter(map(len, encodings['input_ids']), dtype=np.int64, count=len(texts))
+    order = np.argsort(lengths, kind='stable')
+    
+    def batches():
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            yield tokenizer.pad(
+                {key: [encodings[key][i] for i in idx] for key in encodings.keys()},
+                padding='longest', return_tensors='pt'
+            )
+    
+    return order, batches()
+
+def concat_text_fields(df: pd.DataFrame, fields: List[str]) -> List[str]:
+    """Concatena colunas do DataFrame em um texto por linha (operações vetorizadas do pandas)"""
+    fields = [field for field in fields if field in df.columns]
+    if not fields:
+        return [''] * len(df)
+    texts = df[fields[0]].astype(str)
+    for field in fields[1:]:
+        texts = texts + ' ' + df[field].astype(str)
+    return texts.tolist()
+
+def prepare_bert(model: torch.nn.Module, model_name: str, device: torch.device) -> torch.nn.Module:
+    """Prepara o BERT para inferência: FP16 na GPU ou otimizações de CPU, seguido do TorchScript"""
+    model.eval()
+    if device.type == 'cuda':
+        model = model.to(device).half()
+    else:
+        model = optimize_bert(model)
+    return trace_bert(model, model_name, device)
+
+# Modelos exportados para ONNX, reaproveitados entre execuções
+ONNX_DIR = Path("data/onnx")
+
+def load_onnx_bert(model_name: str, device: torch.device):
+    """
+    Carrega o BERT no ONNX Runtime, exportando-o na primeira execução
+    
+    A exportação passa pelo ORTOptimizer (fusão de LayerNorm, GELU e atenção)
+    e, com EMBED_DTYPE=int8 na CPU, pela quantização dinâmica do ORTQuantizer.
+    O modelo retornado aceita (input_ids, attention_mask) como o BERT do torch.
+    """
+    export_dir = ONNX_DIR / model_name.replace('/', '_')
+    quantize = EMBED_DTYPE == 'int8' and device.type == 'cpu'
+    file_name = 'model_optimized_quantized.onnx' if quantize else 'model_optimized.onnx'
+    
+    if not (export_dir / file_name).exists():
+        logger.info(f"Exportando {model_name} para ONNX em {export_dir}")
+        ort_model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        ort_model.save_pretrained(export_dir)
+        ORTOptimizer.from_pretrained(ort_model).optimize(
+            save_dir=export_dir, optimization_config=OptimizationConfig(optimization_level=2)
+        )
+        if quantize:
+            quantizer = ORTQuantizer.from_pretrained(export_dir, file_name='model_optimized.onnx')
+            quantizer.quantize(
+                save_dir=export_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            )
+    
+    provider = 'CUDAExecutionProvider' if device.type == 'cuda' else 'CPUExecutionProvider'
+    logger.info(f"BERT carregado no ONNX Runtime ({file_name}, {provider})")
+    return ORTModelForFeatureExtraction.from_pretrained(export_dir, file_name=file_name, provider=provider)
+
+def load_bert(model_name: str, device: torch.device):
+    """Carrega o BERT pronto para inferência no backend configurado em EMBED_BACKEND"""
+    if EMBED_BACKEND == 'onnx':
+        if ORTModelForFeatureExtraction is None:
+            logger.warning("EMBED_BACKEND=onnx requer optimum[onnxruntime]; usando PyTorch")
+        else:
+            try:
+                return load_onnx_bert(model_name, device)
+            except Exception as e:
+                logger.warning(f"Falha ao carregar o BERT no ONNX Runtime, usando PyTorch: {e}")
+    model = AutoModel.from_pretrained(model_name, torchscript=True)
+    return prepare_bert(model, model_name, device)
+
+@lru_cache(maxsize=None)
+def get_bert(model_name: str, device: torch.device):
+    """
+    Tokenizer e BERT otimizado compartilhados pelo processo
+    
+    Os gerenciadores de deputados, proposições e despesas usam o mesmo modelo;
+    carregá-lo (e otimizá-lo) uma única vez evita cópias de ~450 MB na memória.
+    
+    Returns:
+        Tupla (tokenizer, model)
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    model = load_bert(model_name, device)
+    return tokenizer, model
+
+def to_device(inputs: Dict[str, torch.Tensor], device: torch.device) -> Dict[str, torch.Tensor]:
+    """Move os tensores de entrada para o dispositivo do modelo"""
+    return {k: v.to(device, non_blocking=True) for k, v in inputs.items()}
+
+def bert_forward(model: torch.nn.Module, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+    """Executa o BERT (eager, TorchScript ou ONNX Runtime) e retorna o último hidden state"""
+    return model(inputs['input_ids'], inputs['attention_mask'])[0]
+
+class EmbeddingCollector:
+    """
+    Acumula os embeddings dos lotes em um array FP32 pré-alocado
+    
+    Cada lote é gravado direto na posição original dos seus textos (order de
+    length_bucketed_batches), sem listas intermediárias nem concatenação. Na
+    GPU a cópia passa por um buffer pinned reaproveitado entre os lotes.
+    """
+    
+    def __init__(self, order: np.ndarray, device: torch.device, batch_size: int):
+        self.order = order
+        self.device = device
+        self.batch_size = batch_size
+        self.out = None
+        self._staging = None
+        self._pos = 0
+        
+    def add(self, vectors: torch.Tensor):
+        """Copia um lote de vetores (n, dim) para o array de saída"""
+        n, dim = vectors.shape
+        if self.out is None:
+            self.out = np.empty((len(self.order), dim), dtype=np.float32)
+            if self.device.type == 'cuda':
+                self._staging = torch.empty((self.batch_size, dim), dtype=torch.float32, pin_memory=True)
+        
+        if self._staging is not None:
+            host = self._staging[:n]
+            host.copy_(vectors, non_blocking=True)
+            torch.cuda.current_stream(self.device).synchronize()
+        else:
+            host = vectors
+        self.out[self.order[self._pos:self._pos + n]] = host.numpy()
+        self._pos += n
+        
+    def result(self) -> np.ndarray:
+        """Embeddings na ordem original dos textos"""
+        if self.out is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self.out
+
 class EmbeddingManager:
     """Gerencia a geração, armazenamento e recuperação de embeddings"""
     
@@ -30,7 +334,9 @@ class EmbeddingManager:
         self.model_name = model_name
         self.tokenizer = None
         self.model = None
+        self.device = default_device()
         self.index = None
+        self._index_lock = threading.Lock()
         self.data = []
         
         # Diretórios para armazenamento
@@ -40,33 +346,39 @@ class EmbeddingManager:
         self.index_path = self.base_dir / f"{name}_index.faiss"
         self.data_path = self.base_dir / f"{name}_data.pkl"
         self.embeddings_path = self.base_dir / f"{name}_embeddings.npy"
+        self.embeddings_key_path = self.base_dir / f"{name}_embeddings.key"
+        self.data_parquet_path = self.base_dir / f"{name}_data.parquet"
         
     def initialize_bert(self):
         """Inicializa o modelo BERT"""
         if self.tokenizer is None or self.model is None:
             try:
-                self.tokenizer = AutoTokenizer.from_pretrained('neuralmind/bert-base-portuguese-cased')
-                self.model = AutoModel.from_pretrained('neuralmind/bert-base-portuguese-cased')
-                self.model.eval()  # Modo de avaliação
+                self.tokenizer, self.model = get_bert(self.model_name, self.device)
+                # Cache das tokenizações de textos isolados (consultas se repetem)
+                self._tokenize = lru_cache(maxsize=TOKENIZER_CACHE_SIZE)(self._tokenize_text)
                 logger.info("Modelo BERT inicializado com sucesso")
             except Exception as e:
                 logger.error(f"Erro ao inicializar BERT: {str(e)}")
                 raise
                 
+    def _tokenize_text(self, text: str, max_length: int = 512) -> Dict[str, torch.Tensor]:
+        """Tokeniza um único texto"""
+        return self.tokenizer(text, return_tensors="pt", 
+                            max_length=max_length, truncation=True)
+                
     def generate_embedding(self, text: str) -> np.ndarray:
         """Gera embedding para um texto usando BERT"""
         try:
             self.initialize_bert()
             
-            # Tokenização
-            inputs = self.tokenizer(text, return_tensors="pt", 
-                                  max_length=512, truncation=True, padding=True)
+            # Tokenização (com cache por texto)
+            inputs = to_device(self._tokenize(text, 512), self.device)
             
             # Gera embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
+            with torch.inference_mode(), inference_autocast(self.device):
+                hidden = bert_forward(self.model, inputs)
                 # Usa o embedding do token [CLS] como representação do texto
-                embedding = outputs.last_hidden_state[:, 0, :].numpy()
+                embedding = hidden[:, 0, :].float().cpu().numpy()
             
             return embedding[0]  # Retorna o embedding como array 1D
             
@@ -74,7 +386,35 @@ class EmbeddingManager:
             logger.error(f"Erro ao gerar embedding: {str(e)}")
             raise
             
-    def load_or_create_index(self, dimension: int) -> faiss.Index:
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Gera embeddings para uma lista de textos em lotes
+        
+        Args:
+            texts: Lista de textos
+            batch_size: Quantidade de textos por forward do BERT
+        """
+        try:
+            self.initialize_bert()
+            
+            # Lotes ordenados por comprimento para minimizar o padding
+            order, batches = length_bucketed_batches(self.tokenizer, texts, batch_size)
+            
+            collector = EmbeddingCollector(order, self.device, batch_size)
+            for inputs in batches:
+                inputs = to_device(inputs, self.device)
+                with torch.inference_mode(), inference_autocast(self.device):
+                    hidden = bert_forward(self.model, inputs)
+                    # Usa o embedding do token [CLS] como representação do texto
+                    collector.add(hidden[:, 0, :].float())
+            
+            return collector.result()
+            
+        except Exception as e:
+            logger.error(f"Erro ao gerar embeddings em lote: {str(e)}")
+            raise
+            
+    def load_or_create_index(self, dimension: int, n_vectors: int = 0) -> faiss.Index:
         """Carrega índice existente ou cria um novo"""
         if self.index_path.exists():
             try:
@@ -84,43 +424,138 @@ class EmbeddingManager:
             except Exception as e:
                 logger.warning(f"Erro ao carregar índice: {e}. Criando novo...")
                 
-        self.index = faiss.IndexFlatL2(dimension)
+        self.index = create_index(dimension, n_vectors)
         return self.index
         
-    def process_data(self, data: List[Dict[str, Any]], text_fields: List[str]):
-        """Processa dados para criar embeddings"""
+    def _embeddings_key(self, texts: List[str], text_fields: List[str]) -> str:
+        """Chave do cache de embeddings: modelo, precisão, backend, campos e conteúdo dos textos"""
+        digest = hashlib.blake2b(digest_size=16)
+        config = f"{self.model_name}|{EMBED_DTYPE}|{EMBED_BACKEND}|{self.device.type}"
+        digest.update(f"{config}|{','.join(text_fields)}|{len(texts)}".encode('utf-8'))
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+        
+    def _load_cached_embeddings(self, key: str) -> Optional[np.ndarray]:
+        """
+        Carrega (via mmap) embeddings salvos, se foram gerados com a mesma chave
+        
+        O array pode estar em FP16; add_to_index converte para FP32 só se o
+        índice precisar ser recriado.
+        """
+        if not (self.embeddings_path.exists() and self.embeddings_key_path.exists()):
+            return None
+        if self.embeddings_key_path.read_text() != key:
+            return None
+        logger.info(f"Reutilizando embeddings salvos em {self.embeddings_path}")
+        return np.load(self.embeddings_path, mmap_mode='r')
+        
+    def _save_embeddings(self, embeddings: np.ndarray, key: str):
+        """Salva os embeddings (em FP16, metade do tamanho) e a chave que os identifica"""
+        np.save(self.embeddings_path, embeddings.astype(np.float16, copy=False))
+        self.embeddings_key_path.write_text(key)
+        
+    def process_data(self, data: Union[pd.DataFrame, List[Dict[str, Any]]], text_fields: List[str]):
+        """Processa dados (DataFrame ou lista de dicionários) para criar embeddings"""
+        self.process_many([(data, text_fields)])
+        
+    def process_many(self, jobs: List[Tuple[Union[pd.DataFrame, List[Dict[str, Any]]], List[str]]]):
+        """
+        Processa vários conjuntos de dados em um único índice
+        
+        Os textos de todos os conjuntos passam por uma única chamada em lotes
+        (o forward já usa todas as threads do PyTorch) e são adicionados ao
+        índice na ordem de jobs, de modo que os ids seguem a concatenação dos
+        conjuntos.
+        
+        Args:
+            jobs: Lista de tuplas (dados, campos de texto)
+        """
         try:
-            # Concatena os campos de texto
-            texts = []
-            for item in data:
-                text = " ".join([str(item[field]) for field in text_fields if field in item])
-                texts.append(text)
+            frames = [data if isinstance(data, pd.DataFrame) else pd.DataFrame(data) for data, _ in jobs]
+            self.data = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
             
-            # Gera embeddings
-            embeddings = []
-            for text in texts:
-                embedding = self.generate_embedding(text)
-                embeddings.append(embedding)
+            # Concatena os campos de texto
+            texts_per_job = [
+                concat_text_fields(frame, text_fields) for frame, (_, text_fields) in zip(frames, jobs)
+            ]
+            texts = [text for job_texts in texts_per_job for text in job_texts]
+            fields = [field for _, text_fields in jobs for field in text_fields]
             
-            # Converte para array numpy
-            embeddings_array = np.array(embeddings).astype('float32')
+            # Salva os dados originais junto aos embeddings
+            try:
+                self.data.to_parquet(self.data_parquet_path, index=False)
+            except Exception as e:
+                logger.warning(f"Não foi possível salvar dados em parquet: {e}")
             
-            # Cria/atualiza índice FAISS
-            dimension = embeddings_array.shape[1]
-            self.index = self.load_or_create_index(dimension)
-            self.index.add(embeddings_array)
+            # Reutiliza embeddings já gerados para os mesmos textos
+            key = self._embeddings_key(texts, fields)
+            embeddings_array = self._load_cached_embeddings(key)
+            cached = embeddings_array is not None
+            if not cached:
+                # Gera embeddings em lotes (ordenados por comprimento entre todos os conjuntos)
+                self.initialize_bert()
+                embeddings_array = self.generate_embeddings_batch(texts)
+                embeddings_array = embeddings_array.astype('float32', copy=False)
+                self._save_embeddings(embeddings_array, key)
             
-            # Salva índice
-            faiss.write_index(self.index, str(self.index_path))
+            with self._index_lock:
+                # Cria/atualiza índice FAISS
+                dimension = embeddings_array.shape[1]
+                self.index = self.load_or_create_index(dimension, len(embeddings_array))
+                expected_type = index_type_for(len(embeddings_array))
+                if cached and self.index.ntotal == len(embeddings_array) and isinstance(self.index, expected_type):
+                    # Índice salvo já contém exatamente estes vetores
+                    logger.info(f"Embeddings de {self.name} reaproveitados do disco")
+                    return
+                if self.index.ntotal or not isinstance(self.index, expected_type):
+                    # Índice salvo desatualizado ou de outro tipo: recria com todos os vetores
+                    self.index = create_index(dimension, len(embeddings_array))
+                add_to_index(self.index, embeddings_array)
+                
+                # Salva índice
+                faiss.write_index(self.index, str(self.index_path))
             logger.info(f"Processados {len(texts)} itens para {self.name}")
             
         except Exception as e:
             logger.error(f"Erro ao processar dados: {str(e)}")
             raise
             
+    def _read_index_mmap(self) -> faiss.Index:
+        """Lê o índice salvo via mmap (somente leitura), com leitura completa como alternativa"""
+        try:
+            return faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception as e:
+            logger.warning(f"Índice não suporta mmap, lendo em memória: {e}")
+            return faiss.read_index(str(self.index_path))
+            
+    def warmup(self):
+        """
+        Carrega índice, dados e modelo antes da primeira consulta
+        
+        O índice é mapeado em memória, compartilhando páginas entre processos, e
+        uma busca fictícia traz as regiões mais usadas para o cache de páginas.
+        """
+        if not self.index_path.exists():
+            return
+        try:
+            self.index = self._read_index_mmap()
+            if len(self.data) == 0:
+                self.load_saved_data()
+            self.initialize_bert()
+            self.index.search(np.zeros((1, self.index.d), dtype='float32'), 1)
+            logger.info(f"Índice {self.name} pré-carregado ({self.index.ntotal} vetores)")
+        except Exception as e:
+            logger.warning(f"Falha no pré-carregamento do índice {self.name}: {e}")
+            
     def load_saved_data(self) -> Optional[pd.DataFrame]:
         """Carrega dados salvos anteriormente"""
         try:
+            if self.data_parquet_path.exists():
+                self.data = pd.read_parquet(self.data_parquet_path)
+                logger.info(f"Dados carregados de {self.data_parquet_path}")
+                return self.data
             if self.data_path.exists():
                 with open(self.data_path, 'rb') as f:
                     self.data = pickle.load(f)
@@ -138,18 +573,32 @@ class EmbeddingManager:
             query: Texto para busca
             k: Número de resultados a retornar
         """
+        try:
+            # Gera embedding para a query
+            query_embedding = self.generate_embedding(query)
+            return self.search_by_embedding(query_embedding, k)
+            
+        except Exception as e:
+            logger.error(f"Erro na busca: {str(e)}")
+            return []
+            
+    def search_by_embedding(self, query_embedding: np.ndarray, k: int = 100) -> List[Dict[str, Any]]:
+        """
+        Busca itens similares a um embedding já calculado
+        
+        Args:
+            query_embedding: Embedding da query (1D)
+            k: Número de resultados a retornar
+        """
         try:
             # Carrega dados e índice se necessário
             if self.index is None:
                 if not self.index_path.exists():
                     raise ValueError(f"Índice não encontrado em {self.index_path}")
-                self.index = faiss.read_index(str(self.index_path))
+                self.index = self._read_index_mmap()
                 
             if len(self.data) == 0:
                 self.load_saved_data()
-                
-            # Gera embedding para a query
-            query_embedding = self.generate_embedding(query)
             
             # Busca os k vizinhos mais próximos
             D, I = self.index.search(
@@ -160,7 +609,7 @@ class EmbeddingManager:
             # Prepara resultados
             results = []
             for i, (dist, idx) in enumerate(zip(D[0], I[0])):
-                if idx < len(self.data):
+                if 0 <= idx < len(self.data):
                     item = self.data.iloc[idx].to_dict()
                     item['similarity_score'] = float(dist)
                     results.append(item)
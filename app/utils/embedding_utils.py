@@ -8,8 +8,10 @@ import faiss
 import numpy as np
 from pathlib import Path
 import json
+import threading
 from typing import List, Dict, Any
-from .data_loader import DataLoader
+from .data_loader import get_default_loader
+from .faiss_index import create_index, add_to_index
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -25,9 +27,11 @@ class EmbeddingManager:
         """
         logger.info(f"Inicializando EmbeddingManager com modelo {model_name}")
         self.model = SentenceTransformer(model_name)
-        self.data_loader = DataLoader()
+        self.data_loader = get_default_loader()
         self.index = None
         self.text_mapping = {}  # Mapeia IDs para textos originais
+        # O tokenizer rápido do HF não é thread-safe: um encode de cada vez
+        self._encode_lock = threading.Lock()
 
     def generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """
@@ -59,11 +63,11 @@ class EmbeddingManager:
         logger.info("Construindo índice FAISS")
         dimension = embeddings.shape[1]  # Dimensão dos vetores
         
-        # Inicializa índice L2
-        self.index = faiss.IndexFlatL2(dimension)
+        # Índice L2: exato para bases pequenas, vetores FP16 para bases maiores
+        self.index = create_index(dimension, len(embeddings))
         
         # Adiciona os vetores ao índice
-        self.index.add(embeddings.astype(np.float32))
+        add_to_index(self.index, embeddings)
         logger.info(f"Índice construído com {self.index.ntotal} vetores")
 
     def save_index(self, filepath: str):
@@ -105,6 +109,20 @@ class EmbeddingManager:
         with open(mapping_path, 'r', encoding='utf-8') as f:
             self.text_mapping = json.load(f)
 
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Gera os embeddings de várias consultas em um único lote
+        
+        Args:
+            queries: Textos de consulta
+            
+        Returns:
+            np.ndarray: Matriz float32 com uma linha por consulta
+        """
+        with self._encode_lock:
+            embeddings = self.model.encode(queries, convert_to_numpy=True)
+        return embeddings.astype(np.float32)
+
     def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """
         Busca documentos similares usando o índice FAISS
@@ -119,19 +137,32 @@ class EmbeddingManager:
         if self.index is None:
             raise ValueError("Índice não inicializado")
             
-        # Gera embedding para a query
-        query_embedding = self.model.encode([query])[0].reshape(1, -1)
+        return self.search_embedding(self.encode_queries([query])[0], k)
+
+    def search_embedding(self, query_embedding: np.ndarray, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Busca documentos similares a um embedding de consulta já calculado
         
+        Args:
+            query_embedding: Embedding da consulta (gerado por encode_queries)
+            k: Número de resultados a retornar
+            
+        Returns:
+            Lista de dicionários com resultados e scores
+        """
+        if self.index is None:
+            raise ValueError("Índice não inicializado")
+            
         # Realiza a busca
         distances, indices = self.index.search(
-            query_embedding.astype(np.float32), 
+            np.asarray(query_embedding, dtype=np.float32).reshape(1, -1), 
             k
         )
         
         # Formata os resultados
         results = []
         for dist, idx in zip(distances[0], indices[0]):
-            if idx in self.text_mapping:
+            if str(idx) in self.text_mapping:
                 results.append({
                     'text': self.text_mapping[str(idx)],
                     'score': float(dist)
@@ -145,19 +176,19 @@ class EmbeddingManager:
         """
         logger.info("Iniciando processamento de dados")
         
-        # Carrega dados
+        # Carrega dados (uma única vez no loader compartilhado)
         self.data_loader.load_all_data()
         
         # Lista para armazenar todos os textos
         texts = []
         
         # Processa deputados
-        deputados_df = self.data_loader.load_deputados()
+        deputados_df = self.data_loader.deputados_df
         if deputados_df is not None:
             texts.extend(deputados_df['nome'].tolist())
         
         # Processa proposições
-        proposicoes_df = self.data_loader.load_proposicoes()
+        proposicoes_df = self.data_loader.proposicoes_df
         if proposicoes_df is not None:
             texts.extend(proposicoes_df['ementa'].tolist())
         
@@ -3,13 +3,16 @@ Gerenciamento de embeddings usando BERT e FAISS
 """
 
 import torch
-from transformers import AutoTokenizer, AutoModel
 import faiss
 import numpy as np
 import pandas as pd
 from typing import List, Dict
 import logging
 from tqdm import tqdm
+from .embedding_manager import (
+    default_device, get_bert, inference_autocast, to_device, bert_forward, EmbeddingCollector,
+    create_index, add_to_index
+)
 
 class EmbeddingManager:
     """Gerencia a criação e busca de embeddings usando BERT e FAISS"""
@@ -17,10 +20,8 @@ class EmbeddingManager:
     def __init__(self):
         """Inicializa o gerenciador de embeddings"""
         self.model_name = "neuralmind/bert-base-portuguese-cased"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModel.from_pretrained(self.model_name)
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = self.model.to(self.device)
+        self.device = default_device()
+        self.tokenizer, self.model = get_bert(self.model_name, self.device)
         self.index = None
         self.embeddings = None
         self.dados_originais = []
@@ -36,7 +37,8 @@ class EmbeddingManager:
         Returns:
             Array numpy com embeddings
         """
-        embeddings = []
+        # Saída pré-alocada: cada batch é gravado na sua faixa de linhas
+        collector = EmbeddingCollector(np.arange(len(textos)), self.device, batch_size)
         
         # Processa em batches
         for i in tqdm(range(0, len(textos), batch_size), desc="Gerando embeddings"):
@@ -47,15 +49,14 @@ class EmbeddingManager:
                                   max_length=512, truncation=True, padding=True)
             
             # Move para GPU se disponível
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            inputs = to_device(inputs, self.device)
             
             # Gera embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                batch_embeddings = outputs.last_hidden_state.mean(dim=1)
-                embeddings.append(batch_embeddings.cpu().numpy())
+            with torch.inference_mode(), inference_autocast(self.device):
+                batch_embeddings = bert_forward(self.model, inputs).mean(dim=1)
+                collector.add(batch_embeddings.float())
         
-        return np.vstack(embeddings)
+        return collector.result()
         
     def criar_index(self, textos: List[str], batch_size: int = 32):
         """
@@ -63,19 +64,17 @@ class EmbeddingManager:
         
         Args:
             textos: Lista de textos para indexar
-            batch_size: Tamanho do batch para processamento
+            batch_size: Textos por forward do BERT (o FAISS recebe todos os vetores de uma vez)
         """
         # Gera embeddings em batches
         embeddings = self.gerar_embeddings_batch(textos, batch_size)
         
-        # Cria índice FAISS
+        # Cria índice FAISS (vetores FP16 a partir de SQ_THRESHOLD)
         dimension = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
+        index = create_index(dimension, len(embeddings))
         
-        # Adiciona em batches
-        for i in tqdm(range(0, len(embeddings), batch_size), desc="Adicionando ao FAISS"):
-            batch = embeddings[i:i + batch_size]
-            index.add(batch)
+        # Adiciona todos os vetores em uma única chamada
+        add_to_index(index, embeddings)
         
         # Salva no objeto
         self.index = index
@@ -105,7 +104,7 @@ class EmbeddingManager:
         # Formata resultados
         resultados = []
         for dist, idx in zip(D[0], I[0]):
-            if idx < len(self.dados_originais):
+            if 0 <= idx < len(self.dados_originais):
                 resultados.append({
                     'texto': self.dados_originais[idx],
                     'distancia': float(dist)
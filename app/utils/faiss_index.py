@@ -0,0 +1,49 @@
+"""
+Criação dos índices FAISS conforme o tamanho da base
+
+Módulo leve (apenas FAISS e NumPy), importável sem carregar PyTorch/transformers.
+"""
+
+import os
+import faiss
+import numpy as np
+
+# Abaixo deste número de vetores o índice guarda FP32 (Flat exato)
+SQ_THRESHOLD = 10_000
+# Acima deste número de vetores a busca exaustiva dá lugar ao HNSW
+HNSW_THRESHOLD = 50_000
+# Candidatos explorados por busca no HNSW (maior = mais recall, mais lento)
+HNSW_EF_SEARCH = int(os.getenv('FAISS_EF_SEARCH', 64))
+
+def create_index(dimension: int, n_vectors: int = 0) -> faiss.Index:
+    """
+    Cria o índice FAISS conforme o tamanho da base
+    
+    Bases pequenas usam IndexFlatL2. A partir de SQ_THRESHOLD os vetores são
+    armazenados em FP16 (IndexScalarQuantizer), metade dos bytes lidos por
+    busca, e a partir de HNSW_THRESHOLD em um grafo HNSW sobre vetores FP16.
+    """
+    index_type = index_type_for(n_vectors)
+    if index_type is faiss.IndexFlatL2:
+        return faiss.IndexFlatL2(dimension)
+    if index_type is faiss.IndexScalarQuantizer:
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, 32)
+    index.hnsw.efConstruction = 200
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+def index_type_for(n_vectors: int) -> type:
+    """Tipo de índice FAISS adequado ao número de vetores"""
+    if n_vectors < SQ_THRESHOLD:
+        return faiss.IndexFlatL2
+    if n_vectors < HNSW_THRESHOLD:
+        return faiss.IndexScalarQuantizer
+    return faiss.IndexHNSWSQ
+
+def add_to_index(index: faiss.Index, vectors: np.ndarray):
+    """Adiciona vetores ao índice, treinando o quantizador antes se necessário"""
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
@@ -5,11 +5,10 @@ Módulo responsável pela formatação de dados e textos
 import streamlit as st
 from typing import Any, List, Dict, Union
 from datetime import datetime
-import locale
 from decimal import Decimal
 
-# Configuração para formato brasileiro
-locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+# Troca os separadores do formato americano (1,234.56) pelos brasileiros (1.234,56)
+_BR_SEPARATORS = str.maketrans(',.', '.,')
 
 class DataFormatter:
     """Classe para formatação de dados numéricos e datas"""
@@ -17,10 +16,7 @@ class DataFormatter:
     @staticmethod
     def format_currency(value: Union[float, int, Decimal]) -> str:
         """Formata valor monetário no padrão brasileiro"""
-        try:
-            return locale.currency(value, grouping=True, symbol=True)
-        except Exception:
-            return f"R$ {value:,.2f}"
+        return format_currency(value)
     
     @staticmethod
     def format_percentage(value: float, decimals: int = 1) -> str:
@@ -36,9 +32,9 @@ class DataFormatter:
     def format_number(value: Union[int, float], decimal_places: int = 0) -> str:
         """Formata número com separadores de milhar"""
         try:
-            return locale.format_string(f"%.{decimal_places}f", value, grouping=True)
-        except Exception:
-            return f"{value:,.{decimal_places}f}"
+            return f"{value:,.{decimal_places}f}".translate(_BR_SEPARATORS)
+        except (ValueError, TypeError):
+            return "0"
 
 class TextFormatter:
     """Classe para formatação de textos e elementos visuais"""
@@ -93,7 +89,7 @@ def format_currency(value: float, symbol: str = 'R$') -> str:
         str: Valor formatado como moeda
     """
     try:
-        return f"{symbol} {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        return f"{symbol} {value:,.2f}".translate(_BR_SEPARATORS)
     except (ValueError, TypeError):
         return f"{symbol} 0,00"
 
@@ -145,6 +141,6 @@ def format_number(value: float, decimals: int = 0) -> str:
     try:
         if decimals == 0:
             return f"{int(value):,}".replace(",", ".")
-        return f"{value:,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        return f"{value:,.{decimals}f}".translate(_BR_SEPARATORS)
     except (ValueError, TypeError):
         return "0"
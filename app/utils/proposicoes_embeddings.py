@@ -37,6 +37,9 @@ class ProposicoesEmbeddings:
                 
                 # Processa e salva embeddings
                 self.manager.process_data(data, text_fields)
+            else:
+                # Índice já existe: pré-carrega para a primeira consulta
+                self.manager.warmup()
                 
             logger.info("Dados das proposições carregados com sucesso")
             
@@ -4,7 +4,7 @@ Módulo responsável pelo RAG (Retrieval Augmented Generation)
 
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union
 import logging
 from pathlib import Path
 from .embedding_manager import EmbeddingManager
@@ -27,26 +27,15 @@ class RAGManager:
     def _process_data(self):
         """Processa os dados para o índice FAISS"""
         try:
-            # Processa deputados
-            deputados_data = self.data_loader.deputados_df.to_dict('records')
-            self.embedding_manager.process_data(
-                deputados_data,
-                ['nome', 'siglaPartido', 'siglaUf', 'email', 'urlFoto']
-            )
+            # Deputados, proposições e despesas, nesta ordem, em um único índice
+            self.embedding_manager.process_many([
+                (self.data_loader.deputados_df, ['nome', 'siglaPartido', 'siglaUf', 'email', 'urlFoto']),
+                (self.data_loader.proposicoes_df, ['siglaTipo', 'numero', 'ano', 'ementa', 'tema']),
+                (self.data_loader.despesas_df, ['nomeDeputado', 'tipoDespesa', 'dataDocumento', 'valorDocumento']),
+            ])
             
-            # Processa proposições
-            proposicoes_data = self.data_loader.proposicoes_df.to_dict('records')
-            self.embedding_manager.process_data(
-                proposicoes_data,
-                ['siglaTipo', 'numero', 'ano', 'ementa', 'tema']
-            )
-            
-            # Processa despesas
-            despesas_data = self.data_loader.despesas_df.to_dict('records')
-            self.embedding_manager.process_data(
-                despesas_data,
-                ['nomeDeputado', 'tipoDespesa', 'dataDocumento', 'valorDocumento']
-            )
+            # Textos dos documentos na mesma ordem dos ids do índice
+            self._build_documents()
             
             logger.info("Dados processados e indexados com sucesso")
             
@@ -54,64 +43,89 @@ class RAGManager:
             logger.error(f"Erro ao processar dados para FAISS: {str(e)}")
             raise
     
-    def retrieve(self, query: str, k: int = 5) -> List[str]:
-        """Recupera documentos relevantes usando FAISS"""
+    def retrieve(
+        self, query: Union[str, List[str]], k: int = 5
+    ) -> Union[List[Tuple[str, str]], List[List[Tuple[str, str]]]]:
+        """Recupera documentos relevantes usando FAISS (uma query ou uma lista de queries)"""
+        if isinstance(query, str):
+            results = self.retrieve_batch([query], k)
+            return results[0] if results else []
+        return self.retrieve_batch(query, k)
+    
+    def retrieve_batch(self, queries: List[str], k: int = 5) -> List[List[Tuple[str, str]]]:
+        """
+        Recupera documentos para várias queries de uma vez
+        
+        As queries são codificadas em um único lote do BERT e buscadas com uma
+        única chamada index.search sobre a matriz (N, d), aproveitando as
+        threads do FAISS.
+        """
         try:
-            # Gera embedding para a query
-            query_embedding = self.embedding_manager.generate_embedding(query)
+            # Gera embeddings das queries em lote
+            embeddings = self.embedding_manager.generate_embeddings_batch(queries)
+            query_matrix = np.ascontiguousarray(embeddings, dtype='float32')
             
             # Busca documentos similares
-            D, I = self.embedding_manager.index.search(
-                query_embedding.reshape(1, -1).astype('float32'), 
-                k
-            )
+            D, I = self.embedding_manager.index.search(query_matrix, k)
             
-            # Recupera documentos
-            documents = []
-            for idx in I[0]:
-                if idx < len(self.data_loader.deputados_df):
-                    doc = self.data_loader.deputados_df.iloc[idx]
-                    documents.append(f"Deputado: {doc['nome']} ({doc['siglaPartido']}-{doc['siglaUf']})")
-                elif idx < len(self.data_loader.proposicoes_df):
-                    doc = self.data_loader.proposicoes_df.iloc[idx]
-                    documents.append(f"Proposição: {doc['siglaTipo']} {doc['numero']}/{doc['ano']} - {doc['ementa']}")
-                else:
-                    doc = self.data_loader.despesas_df.iloc[idx]
-                    documents.append(f"Despesa: {doc['nomeDeputado']} - {doc['tipoDespesa']} - R$ {doc['valorDocumento']:,.2f}")
-            
-            return documents
+            return [self._documents(ids) for ids in I]
             
         except Exception as e:
             logger.error(f"Erro ao recuperar documentos: {str(e)}")
             return []
     
-    def generate_prompt(self, query: str, retrieved_docs: List[Dict[str, Any]]) -> str:
-        """Gera prompt para o LLM usando documentos recuperados"""
+    def _build_documents(self):
+        """Formata uma única vez os textos de deputados, proposições e despesas"""
+        deputados = self.data_loader.deputados_df
+        proposicoes = self.data_loader.proposicoes_df
+        despesas = self.data_loader.despesas_df
+        
+        deputados_docs = (
+            'Deputado: ' + deputados['nome'].astype(str)
+            + ' (' + deputados['siglaPartido'].astype(str) + '-' + deputados['siglaUf'].astype(str) + ')'
+        )
+        proposicoes_docs = (
+            'Proposição: ' + proposicoes['siglaTipo'].astype(str) + ' ' + proposicoes['numero'].astype(str)
+            + '/' + proposicoes['ano'].astype(str) + ' - ' + proposicoes['ementa'].astype(str)
+        )
+        despesas_docs = (
+            'Despesa: ' + despesas['nomeDeputado'].astype(str) + ' - ' + despesas['tipoDespesa'].astype(str)
+            + ' - ' + despesas['valorDocumento'].map('R$ {:,.2f}'.format)
+        )
+        
+        self._all_docs = np.concatenate([
+            docs.to_numpy(dtype=object) for docs in (deputados_docs, proposicoes_docs, despesas_docs)
+        ])
+        # Tipo de cada documento, para o generate_prompt agrupar sem inspecionar o texto
+        self._all_tags = np.repeat(
+            np.array(['dep', 'prop', 'desp'], dtype=object),
+            [len(deputados_docs), len(proposicoes_docs), len(despesas_docs)]
+        )
+    
+    def _documents(self, ids: np.ndarray) -> List[Tuple[str, str]]:
+        """Converte os ids retornados pelo FAISS em tuplas (tipo, texto do documento)"""
+        ids = ids[(ids >= 0) & (ids < len(self._all_docs))]
+        return list(zip(self._all_tags[ids].tolist(), self._all_docs[ids].tolist()))
+    
+    def generate_prompt(self, query: str, retrieved_docs: List[Tuple[str, str]]) -> str:
+        """Gera prompt para o LLM usando documentos (tipo, texto) recuperados"""
         try:
-            # Organiza documentos por tipo
-            deputados_docs = [doc for doc in retrieved_docs if 'Deputado' in doc]
-            proposicoes_docs = [doc for doc in retrieved_docs if 'Proposição' in doc]
-            despesas_docs = [doc for doc in retrieved_docs if 'Despesa' in doc]
-            
-            context = "Informações relevantes:\n\n"
+            # Organiza documentos por tipo em uma única passada
+            sections = {
+                'dep': ("Deputados", []),
+                'prop': ("Proposições", []),
+                'desp': ("Despesas", []),
+            }
+            for tipo, doc in retrieved_docs:
+                sections[tipo][1].append(doc)
             
-            # Adiciona informações de deputados
-            if deputados_docs:
-                context += "Deputados:\n"
-                for doc in deputados_docs:
-                    context += f"{doc}\n"
-                    
-            # Adiciona informações de proposições
-            if proposicoes_docs:
-                context += "Proposições:\n"
-                for doc in proposicoes_docs:
-                    context += f"{doc}\n"
-                    
-            # Adiciona informações de despesas
-            if despesas_docs:
-                context += "Despesas:\n"
-                for doc in despesas_docs:
-                    context += f"{doc}\n"
+            # Monta o contexto com uma única junção por seção
+            parts = ["Informações relevantes:\n\n"]
+            for titulo, docs in sections.values():
+                if docs:
+                    parts.append(f"{titulo}:\n")
+                    parts.append("".join(f"{doc}\n" for doc in docs))
+            context = "".join(parts)
                     
             # Gera o prompt final
             prompt = f"""Você é um assistente especializado em dados.
@@ -3,13 +3,94 @@ Módulo responsável por melhorar as buscas usando técnicas avançadas de RAG
 """
 
 import logging
-from typing import List, Dict, Any
-from rank_bm25 import BM25Okapi
+import hashlib
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
 import numpy as np
+
+try:
+    import bm25s
+except ImportError:  # Opcional: sem ele usa o rank_bm25 (Python puro)
+    bm25s = None
+    from rank_bm25 import BM25Okapi
 from .embedding_manager import EmbeddingManager
 
 logger = logging.getLogger(__name__)
 
+# Raiz do projeto: o cache não depende do diretório de trabalho
+ROOT_DIR = Path(__file__).resolve().parents[2]
+# Cache persistente de queries reescritas e resultados de busca
+CACHE_PATH = ROOT_DIR / "data" / "cache" / "rag_cache.sqlite"
+# Reescritas mantidas em memória por SearchEnhancer
+REWRITE_CACHE_SIZE = 1024
+
+def _query_hash(*parts: Any) -> str:
+    """Chave do cache: SHA1 das partes da consulta"""
+    return hashlib.sha1('\0'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+try:
+    from numba import njit, prange
+except ImportError:  # Opcional: sem ele a seleção de top-k usa np.argpartition
+    njit = None
+
+# A partir deste tamanho a seleção de top-k usa o kernel paralelo do numba
+NUMBA_TOPK_MIN = 100_000
+TOPK_CHUNKS = 64
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _topk_numba(scores, k):
+        """Top-k em paralelo: melhores k de cada bloco, depois dos candidatos"""
+        n = scores.shape[0]
+        chunk = max(k, (n + TOPK_CHUNKS - 1) // TOPK_CHUNKS)
+        n_chunks = (n + chunk - 1) // chunk
+        candidates = np.full(n_chunks * k, -1, dtype=np.int64)
+        for c in prange(n_chunks):
+            start = c * chunk
+            end = min(start + chunk, n)
+            order = np.argsort(-scores[start:end])[:k]
+            for j in range(order.shape[0]):
+                candidates[c * k + j] = start + order[j]
+        candidates = candidates[candidates >= 0]
+        return candidates[np.argsort(-scores[candidates])[:k]]
+
+def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+    """Índices dos k maiores scores, em ordem decrescente"""
+    if len(scores) <= k:
+        return np.argsort(scores)[::-1]
+    if njit is not None and len(scores) >= NUMBA_TOPK_MIN:
+        return _topk_numba(scores, k)
+    top = np.argpartition(scores, -k)[-k:]
+    return top[np.argsort(scores[top])[::-1]]
+
+@lru_cache(maxsize=1)
+def _gemini_model():
+    """
+    Modelo Gemini compartilhado pelo processo
+    
+    O SDK só é importado na primeira reescrita (não pesa no carregamento do
+    módulo) e o cliente é criado uma única vez, reaproveitando a conexão.
+    """
+    from google import generativeai as genai
+    
+    genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+    return genai.GenerativeModel('gemini-pro')
+
+@lru_cache(maxsize=1024)
+def _tokenize_query(text: str) -> Tuple[str, ...]:
+    """Tokens da query para o BM25 (em cache, queries se repetem)"""
+    return tuple(text.lower().split())
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """Normaliza scores para [0, 1] (empates viram 0, sem divisão por zero)"""
+    low = scores.min()
+    return (scores - low) / np.maximum(scores.max() - low, 1e-9)
+
 class SearchEnhancer:
     """
     Classe que implementa técnicas avançadas de busca:
@@ -23,6 +104,36 @@ class SearchEnhancer:
         self.documents = []
         self.bm25 = None
         self.tokenized_docs = []
+        self._corpus_hash = ''
+        
+        # Reescritas recentes em memória (antes de consultar o SQLite)
+        self._rewrites: Dict[str, str] = {}
+        
+        # Cache em SQLite, compartilhado entre execuções
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        self._cache = sqlite3.connect(str(CACHE_PATH), check_same_thread=False)
+        self._cache_lock = threading.Lock()
+        with self._cache_lock, self._cache:
+            self._cache.execute(
+                "CREATE TABLE IF NOT EXISTS rewrites (qhash TEXT PRIMARY KEY, rewritten TEXT)"
+            )
+            self._cache.execute(
+                "CREATE TABLE IF NOT EXISTS searches (qhash TEXT PRIMARY KEY, results BLOB)"
+            )
+    
+    def _cache_get(self, table: str, qhash: str) -> Optional[Any]:
+        """Busca um valor no cache"""
+        column = 'rewritten' if table == 'rewrites' else 'results'
+        with self._cache_lock:
+            row = self._cache.execute(
+                f"SELECT {column} FROM {table} WHERE qhash = ?", (qhash,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def _cache_put(self, table: str, qhash: str, value: Any):
+        """Grava um valor no cache"""
+        with self._cache_lock, self._cache:
+            self._cache.execute(f"INSERT OR REPLACE INTO {table} VALUES (?, ?)", (qhash, value))
     
     def setup_bm25(self, documents: List[Dict[str, Any]]):
         """Configura o índice BM25"""
@@ -35,19 +146,66 @@ class SearchEnhancer:
                 for doc in documents
             ]
             
-            # Cria índice BM25
-            self.bm25 = BM25Okapi(self.tokenized_docs)
+            # Cria índice BM25 (bm25s usa matriz esparsa e, com numba, scorer JIT)
+            if bm25s is not None:
+                self.bm25 = bm25s.BM25(backend='auto')
+                self.bm25.index(self.tokenized_docs, show_progress=False)
+            else:
+                self.bm25 = BM25Okapi(self.tokenized_docs)
+            
+            # Resultados em cache só valem para o mesmo conjunto de documentos
+            self._corpus_hash = _query_hash(*(doc['content'] for doc in documents))
             logger.info(f"Índice BM25 criado com {len(documents)} documentos")
             
         except Exception as e:
             logger.error(f"Erro ao configurar BM25: {str(e)}")
             raise
     
+    def _index_fingerprint(self) -> str:
+        """
+        Identifica o modelo e a versão do índice vetorial usados na busca
+        
+        O mtime e o tamanho do arquivo do índice mudam a cada reconstrução, de
+        modo que resultados em cache de um índice anterior deixam de ser usados.
+        """
+        manager = self.embedding_manager
+        try:
+            stat = manager.index_path.stat()
+            version = f"{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            # Índice ainda não salvo: identificado pelo número de vetores em memória
+            version = f"mem:{getattr(manager.index, 'ntotal', 0)}"
+        return f"{manager.model_name}|{version}"
+    
+    def _remember_rewrite(self, query_key: str, rewritten: str):
+        """Guarda a reescrita em memória, descartando a mais antiga quando cheio"""
+        if len(self._rewrites) >= REWRITE_CACHE_SIZE:
+            self._rewrites.pop(next(iter(self._rewrites)))
+        self._rewrites[query_key] = rewritten
+    
+    def _bm25_scores(self, tokenized_query: List[str]) -> np.ndarray:
+        """Scores BM25 da query para todos os documentos"""
+        if bm25s is not None:
+            return np.asarray(self.bm25.get_scores(tokenized_query), dtype=np.float32)
+        return self.bm25.get_scores(tokenized_query)
+    
     def rewrite_query(self, query: str) -> str:
         """
         Reescreve a query para melhorar a recuperação
         Usa o Gemini para expandir e clarificar a pergunta
         """
+        # Perguntas que diferem só em caixa ou espaços compartilham a reescrita
+        query_key = ' '.join(query.lower().split())
+        rewritten = self._rewrites.get(query_key)
+        if rewritten is not None:
+            return rewritten
+        
+        qhash = _query_hash(query_key)
+        cached = self._cache_get('rewrites', qhash)
+        if cached is not None:
+            self._remember_rewrite(query_key, cached)
+            return cached
+        
         try:
             prompt = f"""Reescreva a seguinte pergunta para maximizar a recuperação de informações sobre a Câmara dos Deputados.
 
@@ -68,16 +226,12 @@ Forneça apenas a pergunta reescrita, sem explicações adicionais.
 """
             
             # Usa o Gemini para reescrever
-            from google import generativeai as genai
-            import os
-            
-            genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-            model = genai.GenerativeModel('gemini-pro')
-            
-            response = model.generate_content(prompt)
+            response = _gemini_model().generate_content(prompt)
             rewritten_query = response.text.strip()
             
             logger.info(f"Query reescrita: '{query}' -> '{rewritten_query}'")
+            self._cache_put('rewrites', qhash, rewritten_query)
+            self._remember_rewrite(query_key, rewritten_query)
             return rewritten_query
             
         except Exception as e:
@@ -90,37 +244,59 @@ Forneça apenas a pergunta reescrita, sem explicações adicionais.
         1. Busca vetorial (embeddings)
         2. Busca por palavras-chave (BM25)
         """
+        qhash = _query_hash(self._corpus_hash, self._index_fingerprint(), k, query)
+        cached = self._cache_get('searches', qhash)
+        if cached is not None:
+            # O cache guarda só (posição do documento, score): os resultados são
+            # remontados de self.documents com os mesmos tipos de uma busca nova
+            return [{**self.documents[i], 'score': score} for i, score in json.loads(cached)]
+        
+        query_embedding = None
         try:
             # Reescreve a query
             enhanced_query = self.rewrite_query(query)
             
-            # Busca vetorial
-            vector_results = self.embedding_manager.find_similar(enhanced_query, k)
+            # Pool de candidatos: top da busca vetorial e do BM25
+            n_candidates = min(len(self.documents), 4 * k)
+            
+            # Busca vetorial (ids do índice alinhados com self.documents); o
+            # embedding da query é calculado uma única vez, inclusive para o fallback
+            query_embedding = self.embedding_manager.generate_embedding(enhanced_query)
+            D, I = self.embedding_manager.index.search(
+                query_embedding.reshape(1, -1).astype('float32'), n_candidates
+            )
+            valid = (I[0] >= 0) & (I[0] < len(self.documents))
+            vector_ids, vector_dist = I[0][valid], D[0][valid]
             
             # Busca BM25
-            tokenized_query = enhanced_query.lower().split()
-            bm25_scores = self.bm25.get_scores(tokenized_query)
+            bm25_scores = self._bm25_scores(list(_tokenize_query(enhanced_query)))
+            bm25_ids = _topk(bm25_scores, n_candidates)
             
-            # Normaliza scores
-            vector_scores = np.array([1.0 - (i/k) for i in range(k)])  # Scores decrescentes
-            bm25_scores_norm = (bm25_scores - bm25_scores.min()) / (bm25_scores.max() - bm25_scores.min())
+            # Scores dos candidatos; quem não veio da busca vetorial fica com o pior score
+            candidates = np.union1d(vector_ids, bm25_ids)
+            vector_scores = np.full(len(candidates), -vector_dist.max() if len(vector_dist) else 0.0)
+            vector_scores[np.searchsorted(candidates, vector_ids)] = -vector_dist
             
-            # Combina scores (média ponderada)
-            final_scores = (0.7 * vector_scores + 0.3 * bm25_scores_norm)
+            # Combina scores normalizados no pool (média ponderada)
+            final_scores = 0.7 * _min_max(vector_scores) + 0.3 * _min_max(bm25_scores[candidates])
             
             # Seleciona top-k resultados
-            top_k_indices = np.argsort(final_scores)[-k:][::-1]
+            top = _topk(final_scores, k)
             
             # Retorna documentos
-            results = []
-            for idx in top_k_indices:
-                doc = self.documents[idx]
-                doc['score'] = float(final_scores[idx])
-                results.append(doc)
+            results = [
+                {**self.documents[candidates[i]], 'score': float(final_scores[i])}
+                for i in top
+            ]
             
+            self._cache_put('searches', qhash, json.dumps(
+                [[int(candidates[i]), float(final_scores[i])] for i in top]
+            ))
             return results
             
         except Exception as e:
             logger.error(f"Erro na busca híbrida: {str(e)}")
             # Fallback para busca vetorial simples
-            return self.embedding_manager.find_similar(query, k)
+            if query_embedding is not None:
+                return self.embedding_manager.search_by_embedding(query_embedding, k)
+            return self.embedding_manager.search_similar(query, k)
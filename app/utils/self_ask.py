@@ -3,16 +3,22 @@ Módulo responsável pela implementação do sistema Self-Ask para o assistente
 """
 
 import logging
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
+import faiss
+import numpy as np
 from .embedding_utils import EmbeddingManager
-from .data_loader import DataLoader
+from .data_loader import get_default_loader
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# slots=True (sem __dict__ por instância) só existe a partir do Python 3.10
+@dataclass(**({'slots': True} if sys.version_info >= (3, 10) else {}))
 class SubQuestion:
     """Classe para representar uma sub-pergunta no processo Self-Ask"""
     question: str
@@ -23,10 +29,33 @@ class SubQuestion:
 class SelfAskAssistant:
     """Assistente virtual que usa a técnica Self-Ask para responder perguntas"""
     
+    # Mapeamento de tipos de perguntas para sub-perguntas (pergunta, contexto)
+    QUESTION_PATTERNS = {
+        "partido": (
+            ("Quais são todos os partidos representados?", "distribuição partidária"),
+            ("Qual é o número de deputados por partido?", "contagem por partido"),
+        ),
+        "despesa": (
+            ("Quais são os tipos de despesas registrados?", "categorias de despesas"),
+            ("Qual é o valor total por tipo de despesa?", "soma por categoria"),
+        ),
+        "proposição": (
+            ("Quais são as proposições relacionadas ao tema?", "busca por tema"),
+            ("Quais são os principais pontos dessas proposições?", "análise de conteúdo"),
+        ),
+    }
+    
+    GENERIC_SUB_QUESTIONS = (
+        ("Qual é o contexto geral da pergunta?", "contexto geral"),
+        ("Quais dados são relevantes para esta pergunta?", "dados relevantes"),
+    )
+    
+    _PATTERN_RE = re.compile('|'.join(map(re.escape, QUESTION_PATTERNS)), re.IGNORECASE)
+    
     def __init__(self):
         """Inicializa o assistente com os recursos necessários"""
         self.embedding_manager = EmbeddingManager()
-        self.data_loader = DataLoader()
+        self.data_loader = get_default_loader()
         self.load_resources()
         
     def load_resources(self):
@@ -53,69 +82,30 @@ class SelfAskAssistant:
         Returns:
             Lista de sub-perguntas geradas
         """
-        # Mapeamento de tipos de perguntas para sub-perguntas
-        question_patterns = {
-            "partido": [
-                SubQuestion(
-                    question="Quais são todos os partidos representados?",
-                    context="distribuição partidária"
-                ),
-                SubQuestion(
-                    question="Qual é o número de deputados por partido?",
-                    context="contagem por partido"
-                )
-            ],
-            "despesa": [
-                SubQuestion(
-                    question="Quais são os tipos de despesas registrados?",
-                    context="categorias de despesas"
-                ),
-                SubQuestion(
-                    question="Qual é o valor total por tipo de despesa?",
-                    context="soma por categoria"
-                )
-            ],
-            "proposição": [
-                SubQuestion(
-                    question="Quais são as proposições relacionadas ao tema?",
-                    context="busca por tema"
-                ),
-                SubQuestion(
-                    question="Quais são os principais pontos dessas proposições?",
-                    context="análise de conteúdo"
-                )
-            ]
-        }
-        
-        # Identifica o tipo de pergunta e retorna as sub-perguntas apropriadas
-        for key, sub_questions in question_patterns.items():
-            if key.lower() in question.lower():
-                return sub_questions
+        # Identifica o tipo de pergunta em uma única varredura; em caso de mais
+        # de um tipo, vale a ordem de QUESTION_PATTERNS
+        matched = {match.lower() for match in self._PATTERN_RE.findall(question)}
+        for key, sub_questions in self.QUESTION_PATTERNS.items():
+            if key in matched:
+                return [SubQuestion(question=q, context=ctx) for q, ctx in sub_questions]
                 
         # Se não encontrar um padrão específico, retorna uma abordagem genérica
-        return [
-            SubQuestion(
-                question="Qual é o contexto geral da pergunta?",
-                context="contexto geral"
-            ),
-            SubQuestion(
-                question="Quais dados são relevantes para esta pergunta?",
-                context="dados relevantes"
-            )
-        ]
+        return [SubQuestion(question=q, context=ctx) for q, ctx in self.GENERIC_SUB_QUESTIONS]
         
-    def answer_sub_question(self, sub_question: SubQuestion) -> None:
+    def answer_sub_question(self, sub_question: SubQuestion,
+                            query_embedding: Optional[np.ndarray] = None) -> None:
         """
         Responde uma sub-pergunta usando os dados disponíveis
         
         Args:
             sub_question: Sub-pergunta a ser respondida
+            query_embedding: Embedding da sub-pergunta, se já calculado
         """
-        # Busca informações relevantes usando embeddings
-        results = self.embedding_manager.search(
-            sub_question.question,
-            k=3  # Top 3 resultados mais relevantes
-        )
+        # Busca informações relevantes usando embeddings (top 3 mais relevantes)
+        if query_embedding is None:
+            results = self.embedding_manager.search(sub_question.question, k=3)
+        else:
+            results = self.embedding_manager.search_embedding(query_embedding, k=3)
         
         # Analisa os resultados e formula uma resposta
         if results:
@@ -132,6 +122,13 @@ class SelfAskAssistant:
             sub_question.answer = "Não foi possível encontrar informações relevantes."
             sub_question.confidence = 0.0
             
+    def _answer_in_worker(self, sub_question: SubQuestion, query_embedding: np.ndarray) -> None:
+        """Responde uma sub-pergunta em uma thread do pool, com o FAISS em 1 thread"""
+        # O limite do OpenMP vale para a thread que o define: cada worker busca
+        # sem abrir sua própria equipe de threads (o paralelismo vem do pool)
+        faiss.omp_set_num_threads(1)
+        self.answer_sub_question(sub_question, query_embedding)
+        
     def _format_answer(self, texts: List[str], context: str) -> str:
         """
         Formata uma resposta baseada nos textos relevantes e contexto
@@ -162,9 +159,11 @@ class SelfAskAssistant:
         # Decompõe a pergunta em sub-perguntas
         sub_questions = self.decompose_question(question)
         
-        # Responde cada sub-pergunta
-        for sub_q in sub_questions:
-            self.answer_sub_question(sub_q)
+        # Embeddings de todas as sub-perguntas em um único lote (o tokenizer
+        # não é thread-safe); só as buscas FAISS rodam em paralelo
+        embeddings = self.embedding_manager.encode_queries([sq.question for sq in sub_questions])
+        with ThreadPoolExecutor(max_workers=len(sub_questions)) as executor:
+            list(executor.map(self._answer_in_worker, sub_questions, embeddings))
             
         # Combina as respostas em uma resposta final
         final_answer = self._combine_answers(sub_questions)
@@ -0,0 +1,54 @@
+"""
+Cache das respostas do Gemini
+"""
+
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Respostas mantidas no cache; acima disso as menos usadas são descartadas
+MAX_ENTRIES = 1000
+
+def _prompt_hash(prompt: str) -> bytes:
+    """Chave exata: hash do prompt completo (pergunta + contexto)"""
+    return hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).digest()
+
+class ResponseCache:
+    """
+    Cache de respostas por prompt idêntico (mesma pergunta e mesmo contexto)
+
+    Perguntas apenas parecidas não reaproveitam respostas: os embeddings
+    médios do BERT ficam muito próximos entre perguntas do mesmo tema, e a
+    resposta reaproveitada teria sido gerada a partir de outro contexto.
+
+    Guarda até max_entries respostas, descartando a menos usada
+    recentemente (LRU).
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._exact: "OrderedDict[bytes, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Retorna a resposta em cache para o prompt, ou None"""
+        with self._lock:
+            key = _prompt_hash(prompt)
+            cached = self._exact.get(key)
+            if cached is not None:
+                self._exact.move_to_end(key)
+                logger.info("Resposta recuperada do cache (prompt idêntico)")
+            return cached
+
+    def put(self, prompt: str, response: str):
+        """Registra a resposta do prompt no cache"""
+        with self._lock:
+            key = _prompt_hash(prompt)
+            self._exact[key] = response
+            self._exact.move_to_end(key)
+            if len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
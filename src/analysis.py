@@ -1,3 +1,11 @@
+import os
+import sys
+
+# Limites de threads do OpenMP/MKL antes de qualquer import de numpy/pandas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config.threads_config import setup_threads
+setup_threads()
+
 import pandas as pd
 import json
 import logging
@@ -5,6 +13,11 @@ from pathlib import Path
 import google.generativeai as genai
 from config import GOOGLE_API_KEY
 
+try:
+    import duckdb
+except ImportError:  # Opcional: sem ele as agregações usam pandas
+    duckdb = None
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,32 +26,88 @@ logger = logging.getLogger(__name__)
 genai.configure(api_key=GOOGLE_API_KEY)
 model = genai.GenerativeModel('gemini-pro')
 
+DESPESAS_PATH = "data/processed/serie_despesas_diarias_deputados.parquet"
+# Únicas colunas usadas pelas análises (lidas com projection pushdown)
+DESPESAS_COLUMNS = ['nomeDeputado', 'siglaPartido', 'tipoDespesa', 'valorDocumento']
+
+def _agregar_despesas_duckdb(path):
+    """
+    Calcula as três agregações em uma única leitura do parquet (GROUPING SETS)
+    
+    Returns:
+        Tupla (analise1, analise2, analise3) com o mesmo formato da versão pandas
+    """
+    df = duckdb.sql(f"""
+        SELECT nomeDeputado, tipoDespesa, siglaPartido,
+               GROUPING(nomeDeputado) AS sem_deputado,
+               GROUPING(tipoDespesa) AS sem_tipo,
+               any_value(siglaPartido) AS partido_deputado,
+               SUM(valorDocumento) AS soma,
+               COUNT(valorDocumento) AS quantidade,
+               AVG(valorDocumento) AS media
+        FROM read_parquet('{path}')
+        GROUP BY GROUPING SETS ((nomeDeputado), (tipoDespesa), (siglaPartido))
+    """).df()
+    
+    por_deputado = df[(df['sem_deputado'] == 0) & df['nomeDeputado'].notna()]
+    analise1 = (
+        por_deputado.set_index('nomeDeputado')[['soma', 'partido_deputado']]
+        .rename(columns={'soma': 'valorDocumento', 'partido_deputado': 'siglaPartido'})
+        .sort_values('valorDocumento', ascending=False).head(10)
+    )
+    
+    por_tipo = df[(df['sem_tipo'] == 0) & df['tipoDespesa'].notna()]
+    analise2 = (
+        por_tipo.set_index('tipoDespesa')[['soma', 'quantidade']]
+        .rename(columns={'soma': 'sum', 'quantidade': 'count'})
+        .sort_values('sum', ascending=False)
+    )
+    
+    por_partido = df[(df['sem_deputado'] == 1) & (df['sem_tipo'] == 1) & df['siglaPartido'].notna()]
+    analise3 = pd.concat(
+        {'valorDocumento': por_partido.set_index('siglaPartido')[['media', 'quantidade']]
+         .rename(columns={'media': 'mean', 'quantidade': 'count'})},
+        axis=1
+    ).sort_values(('valorDocumento', 'mean'), ascending=False)
+    
+    return analise1, analise2, analise3
+
+def _agregar_despesas_pandas(path):
+    """Calcula as três agregações com pandas (um groupby por análise)"""
+    df = pd.read_parquet(path, columns=DESPESAS_COLUMNS, engine='pyarrow')
+    
+    # Chaves de baixa cardinalidade como categoria: groupby sobre códigos inteiros
+    for col in ('nomeDeputado', 'siglaPartido', 'tipoDespesa'):
+        df[col] = df[col].astype('category')
+    
+    # Primeira análise: Top 10 deputados com maiores gastos totais
+    analise1 = df.groupby('nomeDeputado', observed=True).agg({
+        'valorDocumento': 'sum',
+        'siglaPartido': 'first'
+    }).sort_values('valorDocumento', ascending=False).head(10)
+    
+    # Segunda análise: Distribuição de gastos por tipo de despesa
+    analise2 = df.groupby('tipoDespesa', observed=True)['valorDocumento'].agg(['sum', 'count']).sort_values('sum', ascending=False)
+    
+    # Terceira análise: Média de gastos por partido
+    analise3 = df.groupby('siglaPartido', observed=True).agg({
+        'valorDocumento': ['mean', 'count']
+    }).sort_values(('valorDocumento', 'mean'), ascending=False)
+    
+    return analise1, analise2, analise3
+
 def realizar_analises_despesas():
     """
     Realiza três análises diferentes sobre as despesas dos deputados usando prompt-chaining.
     Salva os resultados das análises e os insights gerados.
     """
     try:
-        # Carregar dados
-        logger.info("Carregando dados de despesas...")
-        df = pd.read_parquet("data/processed/serie_despesas_diarias_deputados.parquet")
-        
-        # Primeira análise: Top 10 deputados com maiores gastos totais
-        logger.info("Realizando análise 1: Top 10 deputados com maiores gastos...")
-        analise1 = df.groupby('nomeDeputado').agg({
-            'valorDocumento': 'sum',
-            'siglaPartido': 'first'
-        }).sort_values('valorDocumento', ascending=False).head(10)
-        
-        # Segunda análise: Distribuição de gastos por tipo de despesa
-        logger.info("Realizando análise 2: Distribuição por tipo de despesa...")
-        analise2 = df.groupby('tipoDespesa')['valorDocumento'].agg(['sum', 'count']).sort_values('sum', ascending=False)
-        
-        # Terceira análise: Média de gastos por partido
-        logger.info("Realizando análise 3: Média de gastos por partido...")
-        analise3 = df.groupby('siglaPartido').agg({
-            'valorDocumento': ['mean', 'count']
-        }).sort_values(('valorDocumento', 'mean'), ascending=False)
+        # Top 10 deputados, distribuição por tipo de despesa e média por partido
+        logger.info("Realizando análises de despesas...")
+        if duckdb is not None:
+            analise1, analise2, analise3 = _agregar_despesas_duckdb(DESPESAS_PATH)
+        else:
+            analise1, analise2, analise3 = _agregar_despesas_pandas(DESPESAS_PATH)
         
         # Converter DataFrames para formato compatível com JSON
         resultados = {
@@ -1,18 +1,405 @@
+import os
+import sys
+
+# Limites de threads do OpenMP/MKL antes de qualquer import de numpy/pandas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config.threads_config import setup_threads
+setup_threads()
+
+import asyncio
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
-from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+from urllib.parse import parse_qs, urlparse
 import logging
-from config import API_BASE_URL, GOOGLE_API_KEY
+from config import API_BASE_URL, GOOGLE_API_KEY  # o import de config já cria data/processed
 import json
 import google.generativeai as genai
+import matplotlib
+matplotlib.use('Agg')  # Backend sem interface gráfica: só salvamos PNGs
 import matplotlib.pyplot as plt
 
+try:
+    import aiohttp
+except ImportError:  # Opcional: sem ele as requisições à API são sequenciais
+    aiohttp = None
+
+try:
+    import duckdb
+except ImportError:  # Opcional: sem ele as agregações usam pandas
+    duckdb = None
+
+try:
+    import orjson
+except ImportError:  # Opcional: sem ele o JSON usa a biblioteca padrão
+    orjson = None
+
+try:
+    from json_repair import repair_json
+except ImportError:  # Opcional: sem ele respostas com JSON malformado são descartadas
+    repair_json = None
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configurar Gemini
+# Configurar Gemini (modelo criado uma vez e reutilizado em todas as chamadas)
 genai.configure(api_key=GOOGLE_API_KEY)
+model = genai.GenerativeModel('gemini-pro')
+
+# Campos de cada despesa usados na série diária (o restante da resposta é descartado)
+CAMPOS_DESPESA = ('dataDocumento', 'tipoDespesa', 'valorDocumento')
+
+# Despesas brutas (antes do agrupamento), gravadas em um parquet temporário à medida que chegam
+DESPESAS_SCHEMA = pa.schema([
+    ('dataDocumento', pa.string()),
+    ('tipoDespesa', pa.string()),
+    ('valorDocumento', pa.float64()),
+    ('idDeputado', pa.int64()),
+    ('nomeDeputado', pa.string()),
+    ('siglaPartido', pa.string()),
+])
+# Linhas acumuladas antes de gravar um row group (evita um row group por deputado)
+LINHAS_POR_ROW_GROUP = 50_000
+
+# Máximo de requisições simultâneas à API da Câmara
+MAX_REQUISICOES_CONCORRENTES = 32
+
+# Máximo de fatias no gráfico de pizza; partidos excedentes viram "Outros"
+MAX_FATIAS_PIZZA = 20
+
+# Chamadas simultâneas ao Gemini (limitado para respeitar a cota da API)
+MAX_CHAMADAS_GEMINI = 4
+
+# Timeouts (conexão, leitura) em segundos e cabeçalhos comuns das requisições
+TIMEOUT_REQUISICAO = (5, 30)
+HEADERS_API = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+
+# Parquets são escritos uma vez e lidos muitas: zstd compacta mais que o snappy padrão
+PARQUET_OPTIONS = {
+    'compression': 'zstd',
+    'compression_level': 3,
+    'row_group_size': 500_000,
+    'use_dictionary': True,
+}
+
+# Sessão compartilhada: reaproveita conexões keep-alive e repete falhas transitórias
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS_API)
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=MAX_REQUISICOES_CONCORRENTES,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+))
+
+def _loads_json(texto):
+    """
+    Faz o parse de JSON com orjson quando disponível (seus erros herdam de json.JSONDecodeError).
+    """
+    if orjson is not None:
+        return orjson.loads(texto)
+    return json.loads(texto)
+
+# Do primeiro '{' ao último '}' da resposta (ignora cercas de markdown e texto ao redor)
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+def _extrair_json(texto):
+    """
+    Extrai e faz o parse do objeto JSON contido numa resposta do Gemini.
+    
+    Tenta o trecho como veio, depois sem quebras de linha (o modelo às vezes as
+    coloca dentro de strings) e, por fim, via json_repair quando instalado.
+    
+    Returns:
+        O objeto decodificado, ou None se a resposta não contém '{...}'
+        
+    Raises:
+        json.JSONDecodeError: Se nenhuma das tentativas produzir JSON válido
+    """
+    match = _JSON_RE.search(texto)
+    if match is None:
+        return None
+        
+    json_str = match.group(0)
+    try:
+        return _loads_json(json_str)
+    except json.JSONDecodeError:
+        pass
+        
+    try:
+        return _loads_json(json_str.replace('\r', '').replace('\n', ' '))
+    except json.JSONDecodeError:
+        if repair_json is None:
+            raise
+            
+    return _loads_json(repair_json(json_str))
+
+def _salvar_json(dados, output_path):
+    """
+    Salva um objeto em JSON (UTF-8, indentado), com orjson quando disponível.
+    """
+    if orjson is not None:
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(dados, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
+        
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=4)
+
+def _salvar_parquet(df, output_path):
+    """
+    Salva o DataFrame em parquet via pyarrow, unificando antes os chunks de cada
+    coluna para que a escrita não gere um column chunk por fragmento.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    pq.write_table(table, output_path, **PARQUET_OPTIONS)
+
+def _get_json(url, params):
+    """
+    Faz um GET síncrono e retorna o JSON da resposta ({} em caso de erro HTTP).
+    """
+    response = _SESSION.get(url, params=params, timeout=TIMEOUT_REQUISICAO)
+    
+    if response.status_code != 200:
+        logger.error(f"Erro na requisição para {url}: Status {response.status_code}")
+        logger.error(f"Resposta: {response.text}")
+        return {}
+        
+    return response.json()
+
+async def _get_json_async(session, sem, url, params):
+    """
+    Versão assíncrona de _get_json, limitada pelo semáforo compartilhado.
+    """
+    async with sem:
+        async with session.get(url, params=params) as response:
+            if response.status != 200:
+                logger.error(f"Erro na requisição para {url}: Status {response.status}")
+                logger.error(f"Resposta: {await response.text()}")
+                return {}
+                
+            return await response.json()
+
+def _nova_sessao_async():
+    """
+    Sessão aiohttp compartilhada pelas requisições de um lote, limitada a
+    MAX_REQUISICOES_CONCORRENTES conexões.
+    """
+    connector = aiohttp.TCPConnector(limit=MAX_REQUISICOES_CONCORRENTES, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(sock_connect=TIMEOUT_REQUISICAO[0], sock_read=TIMEOUT_REQUISICAO[1])
+    return aiohttp.ClientSession(connector=connector, headers=HEADERS_API, timeout=timeout)
+
+async def _gather_json(requisicoes):
+    """
+    Dispara todas as requisições (url, params) concorrentemente numa única sessão.
+    """
+    sem = asyncio.Semaphore(MAX_REQUISICOES_CONCORRENTES)
+    
+    async with _nova_sessao_async() as session:
+        tasks = [
+            asyncio.create_task(_get_json_async(session, sem, url, params))
+            for url, params in requisicoes
+        ]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+def _coletar_json(requisicoes):
+    """
+    Executa uma lista de requisições (url, params) à API.
+    
+    Usa aiohttp quando disponível e cai para requests sequencial caso contrário.
+    
+    Returns:
+        list: Para cada requisição, na mesma ordem, o JSON da resposta ou a exceção levantada
+    """
+    if not requisicoes:
+        return []
+        
+    if aiohttp is not None:
+        return asyncio.run(_gather_json(requisicoes))
+        
+    resultados = []
+    for url, params in requisicoes:
+        try:
+            resultados.append(_get_json(url, params))
+        except requests.exceptions.RequestException as e:
+            resultados.append(e)
+    return resultados
+
+def _coletar_dados(requisicoes):
+    """
+    Como _coletar_json, mas retorna apenas a lista 'dados' de cada resposta (ou a exceção).
+    """
+    return [
+        r if isinstance(r, Exception) else r.get('dados', [])
+        for r in _coletar_json(requisicoes)
+    ]
+
+def _ultima_pagina(payload):
+    """
+    Número da última página segundo os links de paginação da resposta (1 se ausente).
+    """
+    for link in payload.get('links', []):
+        if link.get('rel') == 'last':
+            query = parse_qs(urlparse(link.get('href', '')).query)
+            return int(query.get('pagina', ['1'])[0])
+    return 1
+
+async def _dados_paginados_async(session, sem, url, params):
+    """
+    'dados' de todas as páginas de uma requisição: a primeira indica a última
+    página (link rel="last") e as demais são buscadas concorrentemente.
+    """
+    primeira = await _get_json_async(session, sem, url, {**params, 'pagina': 1})
+    dados = list(primeira.get('dados', []))
+    
+    ultima = _ultima_pagina(primeira)
+    if ultima > 1:
+        paginas = await asyncio.gather(*(
+            _get_json_async(session, sem, url, {**params, 'pagina': pagina})
+            for pagina in range(2, ultima + 1)
+        ))
+        for payload in paginas:
+            dados.extend(payload.get('dados', []))
+    return dados
+
+async def _processar_paginados_async(requisicoes, consumidor):
+    """
+    Versão assíncrona de _processar_dados_paginados: cada requisição é
+    entregue ao consumidor assim que todas as suas páginas chegam.
+    """
+    sem = asyncio.Semaphore(MAX_REQUISICOES_CONCORRENTES)
+    
+    async with _nova_sessao_async() as session:
+        async def coletar(i, url, params):
+            try:
+                return i, await _dados_paginados_async(session, sem, url, params)
+            except Exception as e:
+                return i, e
+                
+        tasks = [
+            asyncio.create_task(coletar(i, url, params))
+            for i, (url, params) in enumerate(requisicoes)
+        ]
+        for concluida in asyncio.as_completed(tasks):
+            consumidor(*await concluida)
+
+def _processar_dados_paginados(requisicoes, consumidor):
+    """
+    Percorre todas as páginas de cada requisição (url, params) e chama
+    consumidor(i, dados) para cada uma, em ordem de conclusão.
+    
+    dados é a lista 'dados' de todas as páginas da requisição i, ou a exceção
+    levantada. Nenhuma resposta é retida depois de entregue ao consumidor, de
+    modo que a memória não cresce com o número de requisições.
+    """
+    if not requisicoes:
+        return
+        
+    if aiohttp is not None:
+        asyncio.run(_processar_paginados_async(requisicoes, consumidor))
+        return
+        
+    for i, (url, params) in enumerate(requisicoes):
+        try:
+            primeira = _get_json(url, {**params, 'pagina': 1})
+            dados = list(primeira.get('dados', []))
+            for pagina in range(2, _ultima_pagina(primeira) + 1):
+                dados.extend(_get_json(url, {**params, 'pagina': pagina}).get('dados', []))
+        except requests.exceptions.RequestException as e:
+            dados = e
+        consumidor(i, dados)
+
+def _gravar_despesas_brutas(deputados, requisicoes, output_path):
+    """
+    Coleta as despesas de cada deputado e as grava em parquet assim que suas
+    páginas chegam, em row groups de até LINHAS_POR_ROW_GROUP linhas.
+    
+    Returns:
+        int: Total de despesas gravadas
+    """
+    total, pendentes, linhas_pendentes = 0, [], 0
+    
+    with pq.ParquetWriter(output_path, DESPESAS_SCHEMA, compression='zstd', compression_level=3) as writer:
+        def gravar(i, despesas):
+            nonlocal total, linhas_pendentes
+            deputado = deputados[i]
+            if isinstance(despesas, Exception):
+                logger.error(f"Erro ao coletar despesas do deputado {deputado['id']}: {despesas}")
+                return
+            if not despesas:
+                return
+                
+            # Colunas do lote, com as informações do deputado em cada despesa
+            n = len(despesas)
+            colunas = {campo: [despesa.get(campo) for despesa in despesas] for campo in CAMPOS_DESPESA}
+            colunas['idDeputado'] = [deputado['id']] * n
+            colunas['nomeDeputado'] = [deputado['nome']] * n
+            colunas['siglaPartido'] = [deputado['siglaPartido']] * n
+            
+            pendentes.append(pa.RecordBatch.from_pydict(colunas, schema=DESPESAS_SCHEMA))
+            linhas_pendentes += n
+            total += n
+            
+            if linhas_pendentes >= LINHAS_POR_ROW_GROUP:
+                writer.write_table(pa.Table.from_batches(pendentes))
+                pendentes.clear()
+                linhas_pendentes = 0
+                
+        _processar_dados_paginados(requisicoes, gravar)
+        
+        if pendentes:
+            writer.write_table(pa.Table.from_batches(pendentes))
+            
+    return total
+
+def _agrupar_despesas(path, colunas):
+    """
+    Soma valorDocumento por `colunas`, mantendo idDeputado e siglaPartido do grupo.
+    
+    Usa DuckDB (hash aggregate vetorizado lendo o parquet diretamente) quando
+    disponível; o resultado tem o mesmo formato do groupby do pandas.
+    """
+    if duckdb is None:
+        df_despesas = pd.read_parquet(path, engine='pyarrow')
+        
+        # Converter coluna de data (a API devolve ISO-8601; evita a inferência de formato)
+        df_despesas['dataDocumento'] = pd.to_datetime(
+            df_despesas['dataDocumento'], format='ISO8601', cache=True
+        )
+        
+        # Textos de baixa cardinalidade como categoria: groupby sobre códigos inteiros
+        for col in ('nomeDeputado', 'tipoDespesa', 'siglaPartido'):
+            df_despesas[col] = df_despesas[col].astype('category')
+            
+        return df_despesas.groupby(colunas, observed=True).agg({
+            'valorDocumento': 'sum',
+            'idDeputado': 'first',
+            'siglaPartido': 'first'
+        }).reset_index()
+        
+    chaves = ", ".join(f'"{col}"' for col in colunas)
+    # Como no pandas, grupos com chave nula são descartados e o resultado sai ordenado
+    filtro = " AND ".join(f'"{col}" IS NOT NULL' for col in colunas)
+    
+    return duckdb.sql(f"""
+        SELECT {chaves},
+               SUM(valorDocumento) AS valorDocumento,
+               any_value(idDeputado) AS idDeputado,
+               any_value(siglaPartido) AS siglaPartido
+        FROM (
+            SELECT * REPLACE (CAST(dataDocumento AS TIMESTAMP) AS dataDocumento)
+            FROM read_parquet('{path}')
+        )
+        WHERE {filtro}
+        GROUP BY {chaves}
+        ORDER BY {chaves}
+    """).df()
 
 def coletar_despesas_deputados(df_deputados):
     """
@@ -27,84 +414,48 @@ def coletar_despesas_deputados(df_deputados):
     try:
         logger.info("Iniciando coleta de despesas dos deputados...")
         
-        # Lista para armazenar todas as despesas
-        todas_despesas = []
-        
         # Parâmetros para agosto de 2024
         params = {
-            'ano': [2024],  # Lista com o ano
-            'mes': [8],     # Lista com o mês
+            'ano': 2024,
+            'mes': 8,
             'ordenarPor': 'dataDocumento',
             'ordem': 'ASC',
-            'itens': 100    # Máximo permitido pela API
+            'itens': 100    # Máximo permitido pela API por página
         }
         
-        # Iterar sobre cada deputado
-        total_deputados = len(df_deputados)
-        for idx, deputado in df_deputados.iterrows():
-            id_deputado = deputado['id']
-            nome_deputado = deputado['nome']
-            
-            logger.info(f"\nProcessando deputado {idx+1}/{total_deputados}: {nome_deputado} (ID: {id_deputado})")
-            
-            # URL para despesas do deputado
-            url = f"{API_BASE_URL}deputados/{id_deputado}/despesas"
-            
-            try:
-                logger.info(f"Fazendo requisição para: {url}")
-                logger.info(f"Parâmetros: {params}")
-                
-                response = requests.get(url, params=params)
-                
-                if response.status_code == 200:
-                    dados = response.json()
-                    despesas = dados.get('dados', [])
-                    
-                    if despesas:
-                        # Adicionar informações do deputado em cada despesa
-                        for despesa in despesas:
-                            despesa['idDeputado'] = id_deputado
-                            despesa['nomeDeputado'] = nome_deputado
-                            despesa['siglaPartido'] = deputado['siglaPartido']
-                            todas_despesas.append(despesa)
-                            
-                        logger.info(f"Coletadas {len(despesas)} despesas")
-                    else:
-                        logger.info("Nenhuma despesa encontrada")
-                        
-                else:
-                    logger.error(f"Erro na requisição: Status {response.status_code}")
-                    logger.error(f"Resposta: {response.text}")
+        # Uma requisição por deputado, disparadas concorrentemente e
+        # seguindo a paginação para quem tem mais de 100 despesas no mês
+        deputados = df_deputados[['id', 'nome', 'siglaPartido']].to_dict('records')
+        requisicoes = [
+            (f"{API_BASE_URL}deputados/{deputado['id']}/despesas", params)
+            for deputado in deputados
+        ]
+        logger.info(f"Coletando despesas de {len(requisicoes)} deputados...")
+        
+        # Despesas brutas vão para um parquet temporário conforme cada deputado
+        # termina, sem reter as respostas nem materializar um DataFrame com todas
+        fd, brutas_path = tempfile.mkstemp(suffix='.parquet', dir='data/processed')
+        os.close(fd)
+        try:
+            total_despesas = _gravar_despesas_brutas(deputados, requisicoes, brutas_path)
+            logger.info(f"Coletadas {total_despesas} despesas")
                     
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Erro ao coletar despesas do deputado {id_deputado}: {e}")
-                continue
-                
-        # Converter para DataFrame
-        if not todas_despesas:
-            logger.warning("Nenhuma despesa encontrada para o período especificado")
-            return pd.DataFrame()
+            if not total_despesas:
+                logger.warning("Nenhuma despesa encontrada para o período especificado")
+                return pd.DataFrame()
             
-        df_despesas = pd.DataFrame(todas_despesas)
-        
-        # Converter coluna de data
-        if 'dataDocumento' in df_despesas.columns:
-            df_despesas['dataDocumento'] = pd.to_datetime(df_despesas['dataDocumento'])
-        
-        # Agrupar por dia, deputado e tipo de despesa
-        colunas_agrupamento = ['dataDocumento', 'nomeDeputado', 'tipoDespesa']
-        colunas_disponiveis = [col for col in colunas_agrupamento if col in df_despesas.columns]
+            # Agrupar por dia, deputado e tipo de despesa
+            df_agrupado = _agrupar_despesas(brutas_path, ['dataDocumento', 'nomeDeputado', 'tipoDespesa'])
+        finally:
+            os.remove(brutas_path)
         
-        df_agrupado = df_despesas.groupby(colunas_disponiveis).agg({
-            'valorDocumento': 'sum',
-            'idDeputado': 'first',
-            'siglaPartido': 'first'
-        }).reset_index()
+        # Textos de baixa cardinalidade como categoria: dicionário no parquet
+        for col in ('nomeDeputado', 'tipoDespesa', 'siglaPartido'):
+            df_agrupado[col] = df_agrupado[col].astype('category')
         
         # Salvar em parquet
         output_path = "data/processed/serie_despesas_diarias_deputados.parquet"
-        Path("data/processed").mkdir(parents=True, exist_ok=True)
-        df_agrupado.to_parquet(output_path, index=False)
+        _salvar_parquet(df_agrupado, output_path)
         
         logger.info(f"\nDados de despesas salvos com sucesso em {output_path}")
         logger.info(f"Total de registros agrupados: {len(df_agrupado)}")
@@ -128,9 +479,6 @@ def coletar_dados_deputados():
     e salva em formato parquet.
     """
     try:
-        # Criar diretório se não existir
-        Path("data/processed").mkdir(parents=True, exist_ok=True)
-        
         # URL para deputados em exercício
         url = f"{API_BASE_URL}deputados"
         
@@ -144,7 +492,7 @@ def coletar_dados_deputados():
         logger.info("Iniciando coleta de dados dos deputados...")
         
         # Fazer requisição à API
-        response = requests.get(url, params=params)
+        response = _SESSION.get(url, params=params, timeout=TIMEOUT_REQUISICAO)
         response.raise_for_status()  # Levanta exceção para erros HTTP
         
         # Converter resposta para DataFrame
@@ -153,7 +501,7 @@ def coletar_dados_deputados():
         
         # Salvar em formato parquet
         output_path = "data/processed/deputados.parquet"
-        df_deputados.to_parquet(output_path, index=False)
+        _salvar_parquet(df_deputados, output_path)
         
         logger.info(f"Dados salvos com sucesso em {output_path}")
         logger.info(f"Total de deputados coletados: {len(df_deputados)}")
@@ -186,9 +534,19 @@ def gerar_grafico_distribuicao_partidos(df):
         total_deputados = len(df)
         percentuais = (distribuicao / total_deputados * 100).round(2)
         
+        # Fatias do gráfico: os maiores partidos e, se houver mais que
+        # MAX_FATIAS_PIZZA, os demais somados em "Outros"
+        fatias = distribuicao
+        if len(fatias) > MAX_FATIAS_PIZZA:
+            fatias = fatias.iloc[:MAX_FATIAS_PIZZA - 1]
+            fatias = pd.concat([fatias, pd.Series({'Outros': total_deputados - fatias.sum()})])
+        
+        # Rótulos com o percentual já formatado (dispensa o callback autopct por fatia)
+        rotulos = [f"{partido} ({valor / total_deputados:.1%})" for partido, valor in fatias.items()]
+        
         # Configurar o gráfico
         plt.figure(figsize=(15, 10))
-        plt.pie(distribuicao, labels=distribuicao.index, autopct='%1.1f%%')
+        plt.pie(fatias.values, labels=rotulos)
         plt.title('Distribuição de Deputados por Partido')
         
         # Ajustar layout
@@ -196,7 +554,6 @@ def gerar_grafico_distribuicao_partidos(df):
         
         # Salvar gráfico
         output_path = "data/processed/distribuicao_partidos.png"
-        Path("data/processed").mkdir(parents=True, exist_ok=True)
         plt.savefig(output_path, bbox_inches='tight')
         plt.close()
         
@@ -215,19 +572,17 @@ def gerar_insights_distribuicao(distribuicao, percentuais):
     try:
         logger.info("Gerando insights sobre a distribuição dos partidos...")
         
-        # Configurar o modelo Gemini
-        model = genai.GenerativeModel('gemini-pro')
-        
         # Preparar os dados para o prompt
-        dados_partidos = [f"{partido}: {count} deputados ({perc}%)"
-                         for partido, count, perc 
-                         in zip(distribuicao.index, distribuicao.values, percentuais)]
+        dados_partidos = "\n".join(
+            f"{partido}: {count} deputados ({perc}%)"
+            for partido, count, perc in zip(distribuicao.index, distribuicao.values, percentuais)
+        )
         
         # Criar o prompt
         prompt = f"""
         Analise a seguinte distribuição de deputados por partido na Câmara dos Deputados do Brasil:
 
-        {'\n'.join(dados_partidos)}
+        {dados_partidos}
 
         Gere uma análise em formato JSON com a seguinte estrutura exata:
         {{
@@ -258,53 +613,33 @@ def gerar_insights_distribuicao(distribuicao, percentuais):
         # Gerar insights
         response = model.generate_content(prompt)
         
+        # Estrutura básica usada quando a resposta não pode ser aproveitada
+        insights_erro = {
+            "insights": ["Erro ao processar insights do modelo"],
+            "analise_geral": "Não foi possível gerar a análise devido a um erro de formato.",
+            "recomendacoes": ["Tente executar novamente"]
+        }
+        
         try:
-            # Tentar fazer parse do JSON diretamente
             logger.info("Resposta do modelo:")
             logger.info(response.text)
             
-            # Limpar a resposta antes de tentar fazer o parse
-            cleaned_response = response.text.strip()
-            # Remover possíveis caracteres de formatação
-            cleaned_response = cleaned_response.replace('\n', ' ').replace('\r', '')
-            # Remover possíveis textos antes ou depois do JSON
-            start_idx = cleaned_response.find('{')
-            end_idx = cleaned_response.rfind('}') + 1
-            
-            if start_idx != -1 and end_idx != 0:
-                json_str = cleaned_response[start_idx:end_idx]
-                try:
-                    insights = json.loads(json_str)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Erro no parsing do JSON limpo: {e}")
-                    logger.error(f"JSON que falhou: {json_str}")
-                    # Criar estrutura básica em caso de erro
-                    insights = {
-                        "insights": ["Erro ao processar insights do modelo"],
-                        "analise_geral": "Não foi possível gerar a análise devido a um erro de formato.",
-                        "recomendacoes": ["Tente executar novamente"]
-                    }
-            else:
+            insights = _extrair_json(response.text)
+            if insights is None:
                 logger.error("Não foi possível encontrar JSON válido na resposta")
-                insights = {
-                    "insights": ["Erro ao processar insights do modelo"],
-                    "analise_geral": "Não foi possível gerar a análise devido a um erro de formato.",
-                    "recomendacoes": ["Tente executar novamente"]
-                }
-        
+                insights = insights_erro
+                
+        except json.JSONDecodeError as e:
+            logger.error(f"Erro no parsing do JSON: {e}")
+            logger.error(f"Resposta que falhou: {response.text}")
+            insights = insights_erro
         except Exception as e:
             logger.error(f"Erro ao processar resposta do modelo: {e}")
-            insights = {
-                "insights": ["Erro ao processar insights do modelo"],
-                "analise_geral": "Não foi possível gerar a análise devido a um erro de formato.",
-                "recomendacoes": ["Tente executar novamente"]
-            }
+            insights = insights_erro
         
         # Salvar insights
         output_path = "data/processed/insights_distribuicao_deputados.json"
-        Path("data/processed").mkdir(parents=True, exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(insights, f, ensure_ascii=False, indent=4)
+        _salvar_json(insights, output_path)
             
         logger.info(f"Insights salvos com sucesso em {output_path}")
         return insights
@@ -347,44 +682,27 @@ def coletar_proposicoes():
             'itens': 10  # 10 proposições por tema
         }
         
-        # Coletar proposições para cada tema
-        for tema, codigo in temas.items():
-            logger.info(f"\nColetando proposições do tema: {tema} (código: {codigo})")
-            
-            # Adicionar código do tema aos parâmetros
-            params_tema = params.copy()
-            params_tema['codTema'] = codigo
-            
-            # URL para proposições
-            url = f"{API_BASE_URL}proposicoes"
-            
-            try:
-                logger.info(f"Fazendo requisição para: {url}")
-                logger.info(f"Parâmetros: {params_tema}")
+        # URL para proposições
+        url = f"{API_BASE_URL}proposicoes"
+        
+        # Uma requisição por tema, disparadas concorrentemente
+        requisicoes = [(url, {**params, 'codTema': codigo}) for codigo in temas.values()]
+        
+        for (tema, codigo), proposicoes in zip(temas.items(), _coletar_dados(requisicoes)):
+            if isinstance(proposicoes, Exception):
+                logger.error(f"Erro ao coletar proposições do tema {tema}: {proposicoes}")
+                continue
                 
-                response = requests.get(url, params=params_tema)
+            if proposicoes:
+                # Adicionar tema a cada proposição
+                for prop in proposicoes:
+                    prop['tema'] = tema
+                    prop['codTema'] = codigo
+                todas_proposicoes.extend(proposicoes)
                 
-                if response.status_code == 200:
-                    dados = response.json()
-                    proposicoes = dados.get('dados', [])
-                    
-                    if proposicoes:
-                        # Adicionar tema a cada proposição
-                        for prop in proposicoes:
-                            prop['tema'] = tema
-                            prop['codTema'] = codigo
-                            todas_proposicoes.append(prop)
-                            
-                        logger.info(f"Coletadas {len(proposicoes)} proposições")
-                    else:
-                        logger.warning(f"Nenhuma proposição encontrada para o tema {tema}")
-                else:
-                    logger.error(f"Erro na requisição: Status {response.status_code}")
-                    logger.error(f"Resposta: {response.text}")
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Erro ao coletar proposições do tema {tema}: {e}")
-                continue
+                logger.info(f"Coletadas {len(proposicoes)} proposições do tema {tema}")
+            else:
+                logger.warning(f"Nenhuma proposição encontrada para o tema {tema}")
         
         if not todas_proposicoes:
             logger.error("Nenhuma proposição foi coletada")
@@ -395,8 +713,7 @@ def coletar_proposicoes():
         
         # Salvar em parquet
         output_path = "data/processed/proposicoes_deputados.parquet"
-        Path("data/processed").mkdir(parents=True, exist_ok=True)
-        df_proposicoes.to_parquet(output_path, index=False)
+        _salvar_parquet(df_proposicoes, output_path)
         
         logger.info(f"\nDados salvos com sucesso em {output_path}")
         logger.info(f"Total de proposições coletadas: {len(df_proposicoes)}")
@@ -445,13 +762,14 @@ def _processar_chunk(proposicoes_chunk, tema):
         # Log do início do processamento
         logger.info(f"\nProcessando chunk de {len(proposicoes_chunk)} proposições do tema {tema}")
         
-        # Formata as proposições para o prompt
-        proposicoes_texto = []
-        for _, row in proposicoes_chunk.iterrows():
-            prop_texto = f"ID: {row['id']}\n"
-            prop_texto += f"Tipo: {row['siglaTipo']} {row['numero']}/{row['ano']}\n"
-            prop_texto += f"Ementa: {row['ementa']}\n"
-            proposicoes_texto.append(prop_texto)
+        # Formata as proposições para o prompt (um bloco por proposição, separados por linha em branco)
+        proposicoes_texto = "\n".join(
+            f"ID: {id_}\nTipo: {sigla} {numero}/{ano}\nEmenta: {ementa}\n"
+            for id_, sigla, numero, ano, ementa in zip(
+                proposicoes_chunk['id'], proposicoes_chunk['siglaTipo'], proposicoes_chunk['numero'],
+                proposicoes_chunk['ano'], proposicoes_chunk['ementa']
+            )
+        )
         
         # Monta o prompt para o Gemini
         prompt = f"""Analise as seguintes proposições legislativas e forneça um resumo estruturado.
@@ -459,7 +777,7 @@ def _processar_chunk(proposicoes_chunk, tema):
 CONTEXTO: Estas são proposições legislativas sobre {tema}.
 
 PROPOSIÇÕES:
-{'\n'.join(proposicoes_texto)}
+{proposicoes_texto}
 
 INSTRUÇÕES:
 Retorne APENAS um objeto JSON com a seguinte estrutura (sem markdown, sem texto adicional):
@@ -471,8 +789,7 @@ Retorne APENAS um objeto JSON com a seguinte estrutura (sem markdown, sem texto
     ]
 }}"""
         
-        # Configura e chama o modelo Gemini
-        model = genai.GenerativeModel('gemini-pro')
+        # Chama o modelo Gemini
         response = model.generate_content(prompt)
         
         # Log da resposta completa
@@ -480,21 +797,16 @@ Retorne APENAS um objeto JSON com a seguinte estrutura (sem markdown, sem texto
         
         # Tenta processar a resposta
         try:
-            json_str = response.text.strip()
-            
-            # Remove marcadores de código markdown se presentes
-            if json_str.startswith('```'):
-                json_str = json_str.split('```')[1]  # Pega o conteúdo entre os marcadores
-                if json_str.startswith('json'):
-                    json_str = json_str[4:]  # Remove 'json'
-                json_str = json_str.strip()
-            
-            resultado = json.loads(json_str)
+            resultado = _extrair_json(response.text)
+            if resultado is None:
+                logger.error(f"Nenhum JSON encontrado na resposta: {response.text[:200]}")
+                return None
+                
             logger.info("JSON processado com sucesso")
             return resultado
             
         except json.JSONDecodeError as je:
-            logger.error(f"Erro ao decodificar JSON: {str(je)}\nTexto recebido: {json_str[:200]}")
+            logger.error(f"Erro ao decodificar JSON: {str(je)}\nTexto recebido: {response.text[:200]}")
             return None
             
     except Exception as e:
@@ -516,63 +828,73 @@ def sumarizar_proposicoes(df_proposicoes):
     # Dicionário para armazenar resultados
     resultados = {}
     
-    # Processa cada tema
+    # Chunks de 5 proposições de cada tema
+    chunks_por_tema = {}
     for tema in df_proposicoes['tema'].unique():
-        logger.info(f"\nProcessando tema: {tema}")
         proposicoes_tema = df_proposicoes[df_proposicoes['tema'] == tema]
         logger.info(f"Total de proposições para {tema}: {len(proposicoes_tema)}")
+        chunks_por_tema[tema] = [
+            proposicoes_tema.iloc[i:i+5] for i in range(0, len(proposicoes_tema), 5)
+        ]
+    
+    # Os chunks de todos os temas são enviados ao Gemini em paralelo (chamadas
+    # de I/O independentes); os resultados são lidos na ordem original
+    with ThreadPoolExecutor(max_workers=MAX_CHAMADAS_GEMINI) as executor:
+        futuros_por_tema = {
+            tema: [executor.submit(_processar_chunk, chunk, tema) for chunk in chunks]
+            for tema, chunks in chunks_por_tema.items()
+        }
         
-        # Lista para armazenar resultados do tema
-        resultados_tema = []
-        
-        # Processa em chunks de 5 proposições
-        for i in range(0, len(proposicoes_tema), 5):
-            chunk = proposicoes_tema.iloc[i:i+5]
-            logger.info(f"Processando chunk {i//5 + 1} de {(len(proposicoes_tema) + 4)//5}")
+        # Processa cada tema
+        for tema, futuros in futuros_por_tema.items():
+            logger.info(f"\nProcessando tema: {tema}")
             
-            resultado_chunk = _processar_chunk(chunk, tema)
-            if resultado_chunk:
-                resultados_tema.append(resultado_chunk)
-                logger.info("Chunk processado com sucesso")
-            else:
-                logger.warning("Falha ao processar chunk")
-        
-        # Consolida resultados do tema
-        if resultados_tema:
-            logger.info(f"Consolidando {len(resultados_tema)} resultados para {tema}")
+            # Lista para armazenar resultados do tema
+            resultados_tema = []
             
-            # Combina todos os temas únicos
-            todos_temas = list(set(
-                tema for resultado in resultados_tema 
-                for tema in resultado.get('temas', [])
-            ))
+            for i, futuro in enumerate(futuros, start=1):
+                resultado_chunk = futuro.result()
+                if resultado_chunk:
+                    resultados_tema.append(resultado_chunk)
+                    logger.info(f"Chunk {i} de {len(futuros)} processado com sucesso")
+                else:
+                    logger.warning(f"Falha ao processar chunk {i} de {len(futuros)}")
             
-            # Combina todos os destaques
-            todos_destaques = [
-                destaque for resultado in resultados_tema 
-                for destaque in resultado.get('destaques', [])
-            ]
+            # Consolida resultados do tema
+            if resultados_tema:
+                logger.info(f"Consolidando {len(resultados_tema)} resultados para {tema}")
             
-            # Consolida resumos
-            resumo_geral = " ".join(
-                resultado.get('resumo', '') for resultado in resultados_tema
-            )
+                # Combina todos os temas únicos
+                todos_temas = list(set(
+                    tema for resultado in resultados_tema 
+                    for tema in resultado.get('temas', [])
+                ))
+            
+                # Combina todos os destaques
+                todos_destaques = [
+                    destaque for resultado in resultados_tema 
+                    for destaque in resultado.get('destaques', [])
+                ]
+            
+                # Consolida resumos
+                resumo_geral = " ".join(
+                    resultado.get('resumo', '') for resultado in resultados_tema
+                )
             
-            # Estrutura final do tema
-            resultados[tema] = {
-                "resumo_geral": resumo_geral,
-                "temas_principais": todos_temas[:5],
-                "proposicoes_destaque": todos_destaques
-            }
-            logger.info(f"Tema {tema} processado com sucesso")
-        else:
-            logger.warning(f"Nenhum resultado válido para o tema {tema}")
+                # Estrutura final do tema
+                resultados[tema] = {
+                    "resumo_geral": resumo_geral,
+                    "temas_principais": todos_temas[:5],
+                    "proposicoes_destaque": todos_destaques
+                }
+                logger.info(f"Tema {tema} processado com sucesso")
+            else:
+                logger.warning(f"Nenhum resultado válido para o tema {tema}")
     
     # Salva resultados em JSON
     caminho_arquivo = "data/sumarizacao_proposicoes.json"
     try:
-        with open(caminho_arquivo, 'w', encoding='utf-8') as f:
-            json.dump(resultados, f, ensure_ascii=False, indent=4)
+        _salvar_json(resultados, caminho_arquivo)
         logger.info(f"Sumarização das proposições salva em {caminho_arquivo}")
     except Exception as e:
         logger.error(f"Erro ao salvar sumarização: {str(e)}")
@@ -2,105 +2,218 @@
 Gerenciamento de embeddings usando BERT e FAISS
 """
 
+import hashlib
 import torch
-from transformers import AutoTokenizer, AutoModel
+from transformers import AutoConfig
 import faiss
 import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
+from app.utils.embedding_manager import (
+    EMBED_BACKEND, EMBED_DTYPE, default_device, get_bert, inference_autocast, to_device, bert_forward
+)
+from app.utils.faiss_index import create_index, add_to_index
+
+logger = logging.getLogger(__name__)
+
+def criar_index_faiss(embeddings: np.ndarray) -> faiss.Index:
+    """
+    Cria e popula o índice FAISS adequado ao número de vetores
+    
+    O tipo de índice vem de create_index (app/utils/faiss_index), a mesma
+    política de tamanhos e a mesma métrica (L2) do app. Com embeddings
+    normalizados, a distância L2 ao quadrado é 2 - 2*cosseno: a ordem dos
+    resultados é a da similaridade de cosseno.
+    """
+    index = create_index(embeddings.shape[1], len(embeddings))
+    add_to_index(index, embeddings)
+    return index
+
+def hash_textos(textos: List[str]) -> np.ndarray:
+    """Hash de 64 bits do conteúdo de cada texto (identifica textos já codificados)"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'little') for t in textos),
+        dtype=np.uint64, count=len(textos)
+    )
 
 class EmbeddingManager:
     """Gerencia a criação e busca de embeddings usando BERT e FAISS"""
     
     def __init__(self):
-        """Inicializa o gerenciador de embeddings"""
+        """
+        Inicializa o gerenciador de embeddings
+        
+        O BERT vem de get_bert (app/utils/embedding_manager), compartilhado com o
+        app: FP16 na GPU ou as otimizações de CPU configuradas em EMBED_DTYPE.
+        """
         self.model_name = "neuralmind/bert-base-portuguese-cased"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModel.from_pretrained(self.model_name)
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = self.model.to(self.device)
+        self.device = default_device()
+        self.tokenizer, self.model = get_bert(self.model_name, self.device)
+        self.dimension = AutoConfig.from_pretrained(self.model_name).hidden_size
         self.index = None
         self.embeddings = None
+        self.hashes = None
         self.dados_originais = []
         
-    def gerar_embeddings_batch(self, textos: List[str], batch_size: int = 32) -> np.ndarray:
+    def aquecer(self):
+        """Executa um batch de aquecimento (JIT/escolha de kernels) antes do primeiro texto real"""
+        self.gerar_embeddings_batch(["aquecimento do modelo"])
+        
+    def assinatura(self) -> str:
+        """
+        Identifica a configuração que produz os embeddings (modelo, pooling,
+        normalização, precisão e backend); embeddings de outra assinatura não são comparáveis
+        """
+        precisao = 'fp16' if self.device.type == 'cuda' else EMBED_DTYPE
+        return f"{self.model_name}|media-mascarada|l2|{precisao}|{EMBED_BACKEND}"
+        
+    def gerar_embeddings_batch(self, textos: List[str], batch_size: int = 64) -> np.ndarray:
         """
         Gera embeddings para uma lista de textos em batches
         
+        Os textos são agrupados por comprimento, de modo que o padding de cada
+        batch (até o maior texto do batch) seja mínimo; a média ignora o padding.
+        O batch seguinte é tokenizado em uma thread enquanto o modelo processa o atual.
+        
         Args:
             textos: Lista de textos
             batch_size: Tamanho do batch
             
         Returns:
-            Array numpy com embeddings
+            Array numpy com embeddings normalizados (L2), na ordem original dos textos
         """
-        embeddings = []
+        # Saída pré-alocada: cada batch é gravado nas linhas dos seus textos
+        embeddings = np.empty((len(textos), self.dimension), dtype=np.float32)
+        order = np.argsort([len(t) for t in textos], kind='stable')
         
-        # Processa em batches
-        for i in tqdm(range(0, len(textos), batch_size), desc="Gerando embeddings"):
-            batch = textos[i:i + batch_size]
-            
-            # Tokeniza batch
-            inputs = self.tokenizer(batch, return_tensors="pt", 
-                                  max_length=512, truncation=True, padding=True)
-            
-            # Move para GPU se disponível
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Gera embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                batch_embeddings = outputs.last_hidden_state.mean(dim=1)
-                embeddings.append(batch_embeddings.cpu().numpy())
+        def tokenizar(idx):
+            return self.tokenizer([textos[j] for j in idx], return_tensors="pt",
+                                  max_length=512, truncation=True, padding='longest')
+        
+        lotes = [order[i:i + batch_size] for i in range(0, len(textos), batch_size)]
+        if not lotes:
+            return embeddings
         
-        return np.vstack(embeddings)
+        # Processa em batches; o tokenizer (CPU) do próximo batch roda durante o forward do atual
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            proximo = executor.submit(tokenizar, lotes[0])
+            for n, idx in enumerate(tqdm(lotes, desc="Gerando embeddings")):
+                inputs = proximo.result()
+                if n + 1 < len(lotes):
+                    proximo = executor.submit(tokenizar, lotes[n + 1])
+                
+                # Move para GPU se disponível
+                inputs = to_device(inputs, self.device)
+                
+                # Gera embeddings (FP16 na GPU, BF16 na CPU quando ativo)
+                with torch.inference_mode(), inference_autocast(self.device):
+                    hidden = bert_forward(self.model, inputs).float()
+                    mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                    batch_embeddings = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                    embeddings[idx] = batch_embeddings.cpu().numpy()
         
-    def criar_index(self, textos: List[str], batch_size: int = 32):
+        # Norma unitária: a distância L2 dos índices passa a ordenar pelo cosseno
+        faiss.normalize_L2(embeddings)
+        return embeddings
+        
+    def criar_index(self, textos: List[str], batch_size: int = 64,
+                    cache: Optional[Tuple[np.ndarray, np.ndarray]] = None):
         """
         Cria índice FAISS com embeddings dos textos
         
         Args:
             textos: Lista de textos para indexar
-            batch_size: Tamanho do batch para processamento
+            batch_size: Textos por forward do BERT (o FAISS recebe todos os vetores de uma vez)
+            cache: Tupla (hashes, embeddings) de uma execução anterior; textos
+                cujo hash aparece ali reaproveitam o embedding em vez de passar pelo BERT
         """
-        # Gera embeddings em batches
-        embeddings = self.gerar_embeddings_batch(textos, batch_size)
+        hashes = hash_textos(textos)
         
-        # Cria índice FAISS
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
+        if cache is None:
+            # Gera embeddings em batches
+            embeddings = self.gerar_embeddings_batch(textos, batch_size)
+        else:
+            # Codifica apenas os textos novos; os demais vêm do cache
+            hashes_anteriores, embeddings_anteriores = cache
+            posicao = {h: i for i, h in enumerate(hashes_anteriores.tolist())}
+            origem = np.fromiter((posicao.get(h, -1) for h in hashes.tolist()), dtype=np.int64, count=len(hashes))
+            reaproveitados = origem >= 0
+            novos = np.flatnonzero(~reaproveitados)
+            logger.info(f"Reaproveitando {int(reaproveitados.sum())} embeddings; {len(novos)} textos novos")
+            
+            embeddings = np.empty((len(textos), embeddings_anteriores.shape[1]), dtype=np.float32)
+            embeddings[reaproveitados] = embeddings_anteriores[origem[reaproveitados]]
+            if len(novos):
+                embeddings[novos] = self.gerar_embeddings_batch([textos[i] for i in novos], batch_size)
+            
+            # Caches de execuções anteriores podem ter embeddings não normalizados
+            faiss.normalize_L2(embeddings)
         
-        # Adiciona em batches
-        for i in tqdm(range(0, len(embeddings), batch_size), desc="Adicionando ao FAISS"):
-            batch = embeddings[i:i + batch_size]
-            index.add(batch)
+        # Cria índice FAISS (aproximado para coleções grandes, como despesas)
+        index = criar_index_faiss(embeddings)
         
         # Salva no objeto
         self.index = index
         self.embeddings = embeddings
+        self.hashes = hashes
         self.dados_originais = textos
         
-    def buscar_similares(self, texto: str, k: int = 5) -> List[Dict]:
+    def buscar_similares(self, texto: str, k: int = 5,
+                         query_emb: Optional[np.ndarray] = None) -> List[Dict]:
         """
         Busca textos similares no índice
         
         Args:
             texto: Texto para buscar similares
             k: Número de resultados
+            query_emb: Embedding já calculado do texto (evita um forward do BERT)
+            
+        Returns:
+            Lista com os k textos mais similares e a similaridade de cosseno de cada um
+        """
+        query_embs = None if query_emb is None else np.asarray(query_emb).reshape(1, -1)
+        return self.buscar_similares_batch([texto], k, query_embs)[0]
+        
+    def buscar_similares_batch(self, textos: List[str], k: int = 5,
+                               query_embs: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        """
+        Busca textos similares para várias consultas em uma única chamada ao FAISS
+        
+        A matriz (nq, d) de consultas amortiza a leitura do índice (e, no IVF,
+        das listas invertidas) entre todas elas.
+        
+        Args:
+            textos: Textos para buscar similares
+            k: Número de resultados por texto
+            query_embs: Embeddings já calculados dos textos, um por linha
             
         Returns:
-            Lista com os k textos mais similares
+            Para cada texto, a lista de resultados como em buscar_similares
         """
         if self.index is None:
+            return [[] for _ in textos]
+        if not textos:
             return []
             
-        # Gera embedding da query
-        query_emb = self.gerar_embeddings_batch([texto])[0].reshape(1, -1)
+        # Gera embeddings das queries, se não foram fornecidos
+        if query_embs is None:
+            query_embs = self.gerar_embeddings_batch(textos)
+        query_embs = np.array(query_embs, dtype=np.float32).reshape(len(textos), -1)
+        faiss.normalize_L2(query_embs)
         
-        # Busca similares
-        D, I = self.index.search(query_emb, k)
+        # Busca similares; vetores unitários: cosseno = 1 - (distância L2 ao quadrado) / 2
+        D, I = self.index.search(query_embs, k)
+        similaridade = 1.0 - D / 2.0
         
-        # Retorna textos originais
-        return [self.dados_originais[i] for i in I[0]]
+        # Formata resultados (FAISS devolve -1 quando há menos de k vetores)
+        validos = (I >= 0) & (I < len(self.dados_originais))
+        return [
+            [
+                {'texto': self.dados_originais[idx], 'distancia': sim}
+                for idx, sim in zip(I[q][validos[q]].tolist(), similaridade[q][validos[q]].tolist())
+            ]
+            for q in range(len(textos))
+        ]
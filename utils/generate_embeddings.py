@@ -2,49 +2,83 @@
 Gera embeddings para todos os dados usando BERT e FAISS
 """
 
+import os
+import sys
+
+# Limites de threads do OpenMP/MKL antes de qualquer import de numpy/pandas/PyTorch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config.threads_config import setup_threads, configure_threads
+setup_threads()
+
 import pandas as pd
 import json
 from pathlib import Path
 import numpy as np
-import pickle
 import faiss
 from embeddings import EmbeddingManager
 import logging
-from tqdm import tqdm
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Threads do PyTorch/FAISS (carregados pelos imports acima)
+configure_threads()
+
 def load_json(file_path):
     """Carrega arquivo JSON"""
     logger.info(f"Carregando JSON: {file_path}")
     with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def save_embeddings(name, data, embeddings, index):
+def load_cache(name, assinatura):
+    """
+    Carrega (hashes, embeddings) da execução anterior para reaproveitar
+    os embeddings de textos inalterados; None se não houver cache ou se ele
+    foi gerado com outra configuração (modelo, pooling, precisão)
+    """
+    cache_path = Path("data/embeddings") / f"{name}_embeddings_cache.npz"
+    if not cache_path.exists():
+        return None
+    with np.load(cache_path) as cache:
+        if 'assinatura' not in cache.files or str(cache['assinatura']) != assinatura:
+            logger.info(f"Cache de {name} gerado com outra configuração; recalculando embeddings")
+            return None
+        return cache['hashes'], cache['embeddings']
+
+def save_embeddings(name, data, embeddings, index, hashes=None, assinatura=None):
     """Salva embeddings e dados relacionados"""
     base_path = Path("data/embeddings")
     base_path.mkdir(parents=True, exist_ok=True)
     
     logger.info(f"Salvando dados para: {name}")
     
-    # Salva dados originais
-    with open(base_path / f"{name}_data.pkl", "wb") as f:
-        pickle.dump(data, f)
+    # Salva dados originais (textos) em JSON lines: um texto por linha, sem pickle
+    (base_path / f"{name}_data.jsonl").write_text(
+        "\n".join(json.dumps(texto, ensure_ascii=False) for texto in data), encoding='utf-8'
+    )
     
-    # Salva embeddings
-    np.save(str(base_path / f"{name}_embeddings.npy"), embeddings)
+    # Salva embeddings em FP16 (metade do tamanho; o índice FAISS guarda os vetores em FP32)
+    np.save(str(base_path / f"{name}_embeddings.npy"), embeddings.astype(np.float16, copy=False),
+            allow_pickle=False)
     
     # Salva índice FAISS
     faiss.write_index(index, str(base_path / f"{name}_index.faiss"))
     
+    # Cache hash -> embedding para a próxima execução (arquivo próprio: o
+    # .npy acima pode ser sobrescrito pelo app com outros textos)
+    if hashes is not None and assinatura is not None:
+        np.savez(base_path / f"{name}_embeddings_cache.npz",
+                 hashes=hashes, embeddings=embeddings.astype(np.float16, copy=False),
+                 assinatura=np.array(assinatura))
+    
     logger.info(f"Dados salvos com sucesso para: {name}")
 
 def main():
     # Inicializa gerenciador
     logger.info("Inicializando EmbeddingManager com BERT português...")
     manager = EmbeddingManager()
+    assinatura = manager.assinatura()
     
     # Lista todos os arquivos que vamos processar
     logger.info("\nArquivos que serão processados:")
@@ -58,54 +92,42 @@ def main():
     # Processa deputados
     logger.info("\nProcessando deputados...")
     deputados = pd.read_parquet("data/processed/deputados.parquet")
-    textos_deputados = [
-        f"Deputado {row['nome']} do partido {row['siglaPartido']} " + 
-        f"representando {row['siglaUf']}"
-        for _, row in deputados.iterrows()
-    ]
+    textos_deputados = (
+        "Deputado " + deputados['nome'].astype(str) +
+        " do partido " + deputados['siglaPartido'].astype(str) +
+        " representando " + deputados['siglaUf'].astype(str)
+    ).tolist()
     logger.info(f"Total de deputados: {len(textos_deputados)}")
-    manager.criar_index(textos_deputados)
-    save_embeddings("deputados", textos_deputados, 
-                   manager.embeddings, manager.index)
+    manager.criar_index(textos_deputados, cache=load_cache("deputados", assinatura))
+    save_embeddings("deputados", textos_deputados,
+                   manager.embeddings, manager.index, manager.hashes, assinatura)
     
     # Processa proposições
     logger.info("\nProcessando proposições...")
     proposicoes = pd.read_parquet("data/processed/proposicoes_deputados.parquet")
-    textos_proposicoes = [
-        f"Proposição: {row['ementa']}"
-        for _, row in proposicoes.iterrows()
-    ]
+    textos_proposicoes = ("Proposição: " + proposicoes['ementa'].astype(str)).tolist()
     logger.info(f"Total de proposições: {len(textos_proposicoes)}")
-    manager.criar_index(textos_proposicoes)
-    save_embeddings("proposicoes", textos_proposicoes, 
-                   manager.embeddings, manager.index)
+    manager.criar_index(textos_proposicoes, cache=load_cache("proposicoes", assinatura))
+    save_embeddings("proposicoes", textos_proposicoes,
+                   manager.embeddings, manager.index, manager.hashes, assinatura)
     
-    # Processa despesas (em batches)
+    # Processa despesas
     logger.info("\nProcessando despesas...")
     despesas = pd.read_parquet("data/processed/serie_despesas_diarias_deputados.parquet")
     logger.info("Colunas disponíveis:")
     logger.info(despesas.columns.tolist())
     
-    textos_despesas = []
-    batch_size = 1000
-    total_batches = (len(despesas) + batch_size - 1) // batch_size
-    
-    for batch_idx in tqdm(range(total_batches), desc="Processando despesas em batches"):
-        start_idx = batch_idx * batch_size
-        end_idx = min((batch_idx + 1) * batch_size, len(despesas))
-        batch_despesas = despesas.iloc[start_idx:end_idx]
-        
-        batch_textos = [
-            f"Despesa de {row['nomeDeputado']}: {row['tipoDespesa']} " +
-            f"no valor de R$ {row['valorDocumento']:.2f}"
-            for _, row in batch_despesas.iterrows()
-        ]
-        textos_despesas.extend(batch_textos)
+    # Montagem vetorizada dos textos; o batching do BERT fica em criar_index
+    textos_despesas = (
+        "Despesa de " + despesas['nomeDeputado'].astype(str) +
+        ": " + despesas['tipoDespesa'].astype(str) +
+        " no valor de R$ " + despesas['valorDocumento'].map('{:.2f}'.format)
+    ).tolist()
     
     logger.info(f"Total de despesas: {len(textos_despesas)}")
-    manager.criar_index(textos_despesas)
-    save_embeddings("despesas", textos_despesas, 
-                   manager.embeddings, manager.index)
+    manager.criar_index(textos_despesas, cache=load_cache("despesas", assinatura))
+    save_embeddings("despesas", textos_despesas,
+                   manager.embeddings, manager.index, manager.hashes, assinatura)
     
     # Processa insights de despesas
     logger.info("\nProcessando insights de despesas...")
@@ -115,9 +137,9 @@ def main():
         for insight in insights_despesas
     ]
     logger.info(f"Total de insights de despesas: {len(textos_insights_despesas)}")
-    manager.criar_index(textos_insights_despesas)
+    manager.criar_index(textos_insights_despesas, cache=load_cache("insights_despesas", assinatura))
     save_embeddings("insights_despesas", textos_insights_despesas,
-                   manager.embeddings, manager.index)
+                   manager.embeddings, manager.index, manager.hashes, assinatura)
     
     # Processa insights de distribuição
     logger.info("\nProcessando insights de distribuição...")
@@ -127,9 +149,9 @@ def main():
         for insight in insights_dist
     ]
     logger.info(f"Total de insights de distribuição: {len(textos_insights_dist)}")
-    manager.criar_index(textos_insights_dist)
+    manager.criar_index(textos_insights_dist, cache=load_cache("insights_distribuicao", assinatura))
     save_embeddings("insights_distribuicao", textos_insights_dist,
-                   manager.embeddings, manager.index)
+                   manager.embeddings, manager.index, manager.hashes, assinatura)
     
     # Processa sumarizações
     logger.info("\nProcessando sumarizações...")
@@ -139,9 +161,9 @@ def main():
         for sum in sumarizacoes['sumarizacoes_por_tema']
     ]
     logger.info(f"Total de sumarizações: {len(textos_sumarizacoes)}")
-    manager.criar_index(textos_sumarizacoes)
+    manager.criar_index(textos_sumarizacoes, cache=load_cache("sumarizacoes", assinatura))
     save_embeddings("sumarizacoes", textos_sumarizacoes,
-                   manager.embeddings, manager.index)
+                   manager.embeddings, manager.index, manager.hashes, assinatura)
     
     logger.info("\nTodos os embeddings foram gerados com sucesso!")
     logger.info("Usando modelo: neuralmind/bert-base-portuguese-cased")
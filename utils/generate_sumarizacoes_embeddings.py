@@ -2,21 +2,28 @@
 Gera embeddings apenas para o arquivo de sumarizações
 """
 import os
+import sys
 os.environ['KMP_DUPLICATE_LIB_OK']='True'
 
+# Limites de threads do OpenMP/MKL antes de qualquer import de numpy/pandas/PyTorch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.config.threads_config import setup_threads, configure_threads
+setup_threads()
+
 import json
 from pathlib import Path
 import numpy as np
-import pickle
 import faiss
 from embeddings import EmbeddingManager
 import logging
-from tqdm import tqdm
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Threads do PyTorch/FAISS (carregados pelos imports acima)
+configure_threads()
+
 def load_json(file_path):
     """Carrega arquivo JSON"""
     logger.info(f"Carregando JSON: {file_path}")
@@ -30,12 +37,14 @@ def save_embeddings(name, data, embeddings, index):
     
     logger.info(f"Salvando dados para: {name}")
     
-    # Salva dados originais
-    with open(base_path / f"{name}_data.pkl", "wb") as f:
-        pickle.dump(data, f)
+    # Salva dados originais (textos) em JSON lines: um texto por linha, sem pickle
+    (base_path / f"{name}_data.jsonl").write_text(
+        "\n".join(json.dumps(texto, ensure_ascii=False) for texto in data), encoding='utf-8'
+    )
     
-    # Salva embeddings
-    np.save(str(base_path / f"{name}_embeddings.npy"), embeddings)
+    # Salva embeddings em FP16 (metade do tamanho; o índice FAISS guarda os vetores em FP32)
+    np.save(str(base_path / f"{name}_embeddings.npy"), embeddings.astype(np.float16, copy=False),
+            allow_pickle=False)
     
     # Salva índice FAISS
     faiss.write_index(index, str(base_path / f"{name}_index.faiss"))
@@ -51,10 +60,10 @@ def main():
     logger.info("\nProcessando sumarizações...")
     sumarizacoes = load_json("data/processed/sumarizacao_proposicoes.json")
     
-    textos_sumarizacoes = []
-    for sum in tqdm(sumarizacoes['sumarizacoes_por_tema'], desc="Processando sumarizações"):
-        texto = f"Sumarização do tema {sum['tema']}: {sum['sumarizacao']}"
-        textos_sumarizacoes.append(texto)
+    textos_sumarizacoes = [
+        f"Sumarização do tema {sum['tema']}: {sum['sumarizacao']}"
+        for sum in sumarizacoes['sumarizacoes_por_tema']
+    ]
     
     logger.info(f"Total de sumarizações: {len(textos_sumarizacoes)}")
     
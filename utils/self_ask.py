@@ -2,25 +2,78 @@
 Implementação da técnica Self-Ask para o assistente virtual
 """
 
-from typing import List, Dict, Any
+import re
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
 import logging
+import numpy as np
 from .embeddings import EmbeddingManager
 
+# Perguntas do usuário cujas respostas ficam em memória (LRU)
+MAX_RESPOSTAS_CACHE = 256
+
 class SelfAskAssistant:
     """
     Implementa a técnica Self-Ask para melhorar as respostas do assistente.
     A técnica consiste em quebrar perguntas complexas em sub-perguntas mais simples.
     """
     
+    # Exemplos de sub-perguntas para diferentes tipos de consultas
+    SUBPERGUNTAS = {
+        "partido": (
+            "Quais são todos os partidos representados?",
+            "Quantos deputados cada partido tem?",
+            "Qual partido tem mais representantes?"
+        ),
+        "despesas": (
+            "Quais são os tipos de despesas registrados?",
+            "Qual o valor total por deputado?",
+            "Quais são as despesas mais comuns?"
+        ),
+        "proposicoes": (
+            "Qual o tema da proposição?",
+            "Quais são as palavras-chave relevantes?",
+            "Existem proposições similares?"
+        )
+    }
+    
+    # Sub-pergunta usada quando nenhum tipo é reconhecido
+    SUBPERGUNTAS_PADRAO = ("Poderia especificar melhor sua pergunta?",)
+    
+    # Uma única varredura da pergunta encontra todos os tipos citados
+    _TIPOS_RE = re.compile("|".join(re.escape(tipo) for tipo in SUBPERGUNTAS), re.IGNORECASE)
+    
     def __init__(self, embedding_manager: EmbeddingManager):
         """
         Inicializa o assistente com Self-Ask
         
+        As sub-perguntas são fixas: o contexto de cada uma é buscado uma única
+        vez (um forward do BERT para todas) e reaproveitado em toda resposta.
+        
         Args:
             embedding_manager: Gerenciador de embeddings para busca semântica
         """
         self.embedding_manager = embedding_manager
         self.context = {}
+        self._sub_cache: Dict[str, Dict[str, Any]] = {}
+        self._responder_cacheado = lru_cache(maxsize=MAX_RESPOSTAS_CACHE)(self._responder)
+        
+        if self.embedding_manager.index is not None:
+            self._precalcular_contextos(
+                [p for perguntas in self.SUBPERGUNTAS.values() for p in perguntas]
+            )
+        
+    def _precalcular_contextos(self, subperguntas: List[str]):
+        """Busca (um batch de embeddings e uma busca FAISS) e guarda o contexto das sub-perguntas"""
+        embeddings = self.embedding_manager.gerar_embeddings_batch(subperguntas)
+        resultados = self.embedding_manager.buscar_similares_batch(subperguntas, query_embs=embeddings)
+        for subpergunta, docs in zip(subperguntas, resultados):
+            self._sub_cache[subpergunta] = self._montar_contexto(docs)
+        
+    def limpar_cache(self):
+        """Descarta contextos e respostas em cache (após recriar o índice)"""
+        self._sub_cache.clear()
+        self._responder_cacheado.cache_clear()
         
     def _gerar_subperguntas(self, pergunta: str) -> List[str]:
         """
@@ -32,49 +85,37 @@ class SelfAskAssistant:
         Returns:
             Lista de sub-perguntas
         """
-        # Exemplos de sub-perguntas para diferentes tipos de consultas
-        subperguntas = {
-            "partido": [
-                "Quais são todos os partidos representados?",
-                "Quantos deputados cada partido tem?",
-                "Qual partido tem mais representantes?"
-            ],
-            "despesas": [
-                "Quais são os tipos de despesas registrados?",
-                "Qual o valor total por deputado?",
-                "Quais são as despesas mais comuns?"
-            ],
-            "proposicoes": [
-                "Qual o tema da proposição?",
-                "Quais são as palavras-chave relevantes?",
-                "Existem proposições similares?"
-            ]
-        }
-        
         # Identifica o tipo de pergunta e retorna sub-perguntas relevantes
-        for tipo, perguntas in subperguntas.items():
-            if tipo.lower() in pergunta.lower():
-                return perguntas
+        # (havendo mais de um tipo, vale a ordem de SUBPERGUNTAS)
+        citados = {m.group().lower() for m in self._TIPOS_RE.finditer(pergunta)}
+        for tipo, perguntas in self.SUBPERGUNTAS.items():
+            if tipo in citados:
+                return list(perguntas)
                 
-        return ["Poderia especificar melhor sua pergunta?"]
+        return list(self.SUBPERGUNTAS_PADRAO)
         
-    def _buscar_contexto(self, pergunta: str) -> Dict[str, Any]:
+    def _buscar_contexto(self, pergunta: str, query_emb: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Busca informações relevantes usando embeddings
         
         Args:
             pergunta: Pergunta ou sub-pergunta
+            query_emb: Embedding já calculado da pergunta, se disponível
             
         Returns:
             Dicionário com informações relevantes
         """
         # Busca documentos similares
-        resultados = self.embedding_manager.buscar_similares(pergunta)
-        
-        # Organiza o contexto
+        resultados = self.embedding_manager.buscar_similares(pergunta, query_emb=query_emb)
+        return self._montar_contexto(resultados)
+    
+    @staticmethod
+    def _montar_contexto(resultados: List[Dict]) -> Dict[str, Any]:
+        """Organiza os documentos encontrados e a confiança da busca"""
         contexto = {
             "documentos_relevantes": resultados,
-            "confianca": 1.0 / (1.0 + resultados[0]["distancia"]) if resultados else 0
+            # Embeddings normalizados: a "distância" é o cosseno, já em [-1, 1]
+            "confianca": max(0.0, resultados[0]["distancia"]) if resultados else 0
         }
         
         return contexto
@@ -89,17 +130,23 @@ class SelfAskAssistant:
         Returns:
             Resposta elaborada
         """
+        return self._responder_cacheado(pergunta)
+    
+    def _responder(self, pergunta: str) -> str:
+        """Resposta sem cache (ver responder)"""
         # Gera sub-perguntas
         subperguntas = self._gerar_subperguntas(pergunta)
         
-        # Busca contexto para cada sub-pergunta
-        contextos = []
-        for subpergunta in subperguntas:
-            contexto = self._buscar_contexto(subpergunta)
-            contextos.append({
-                "pergunta": subpergunta,
-                "contexto": contexto
-            })
+        # Sub-perguntas ainda sem contexto em cache (embeddings em uma única chamada ao BERT)
+        faltantes = [s for s in subperguntas if s not in self._sub_cache]
+        if faltantes:
+            self._precalcular_contextos(faltantes)
+        
+        # Contexto de cada sub-pergunta
+        contextos = [
+            {"pergunta": subpergunta, "contexto": self._sub_cache[subpergunta]}
+            for subpergunta in subperguntas
+        ]
             
         # Combina as informações para gerar resposta
         resposta = self._formatar_resposta(pergunta, contextos)
@@ -117,13 +164,13 @@ class SelfAskAssistant:
         Returns:
             Resposta formatada
         """
-        # Exemplo de formatação básica
-        resposta = f"Analisando sua pergunta: '{pergunta}'\n\n"
+        # Exemplo de formatação básica (partes unidas uma única vez ao final)
+        partes = [f"Analisando sua pergunta: '{pergunta}'\n\n"]
         
         for ctx in contextos:
-            resposta += f"- {ctx['pergunta']}\n"
+            partes.append(f"- {ctx['pergunta']}\n")
             if ctx['contexto']['documentos_relevantes']:
                 doc = ctx['contexto']['documentos_relevantes'][0]
-                resposta += f"  → {doc['texto'][:200]}...\n\n"
+                partes.append(f"  → {doc['texto'][:200]}...\n\n")
                 
-        return resposta
+        return "".join(partes)